@@ -16,6 +16,103 @@
 
 from game import Directions, Actions
 import util
+import collections, heapq
+import numpy as np
+
+class PackedStateEncoder:
+    """
+    Maps a GameState to a single integer, for tabular agents on small
+    layouts.  Only the chosen parts of the state are encoded:
+
+      pacman   - the cell of pacman
+      ghosts   - cell and direction of every ghost
+      food     - which of the food of the first state is left
+      capsules - which of the capsules of the first state are left
+      scared   - whether every ghost is scared
+
+    Each part is a digit of a mixed radix number, so different states give
+    different codes as long as they agree on the parts left out.  size is
+    the number of codes.
+    """
+    PARTS = ['pacman', 'ghosts', 'food', 'capsules', 'scared']
+    DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+
+    def __init__(self, state, parts=PARTS):
+        for part in parts:
+            if part not in self.PARTS: raise Exception('Unknown state part: ' + part)
+        self.parts = list(parts)
+        walls = state.getWalls()
+        self.cells = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]: self.cells[(x, y)] = len(self.cells)
+        self.directions = dict((direction, i) for i, direction in enumerate(self.DIRECTIONS))
+        self.foodCells = state.getFood().asList()
+        self.capsuleCells = list(state.getCapsules())
+        self.numGhosts = state.getNumAgents() - 1
+
+        radices = {'pacman': [len(self.cells)],
+                   'ghosts': [len(self.cells), len(self.DIRECTIONS)] * self.numGhosts,
+                   'food': [2] * len(self.foodCells),
+                   'capsules': [2] * len(self.capsuleCells),
+                   'scared': [2] * self.numGhosts}
+        self.size = 1
+        for part in self.parts:
+            for radix in radices[part]:
+                self.size *= radix
+
+    def encode(self, state):
+        numCells, code = len(self.cells), 0
+        for part in self.parts:
+            if part == 'pacman':
+                code = code * numCells + self.cells[util.nearestPoint(state.getPacmanPosition())]
+            elif part == 'ghosts':
+                for ghost in state.getGhostStates():
+                    code = code * numCells + self.cells[util.nearestPoint(ghost.getPosition())]
+                    code = code * len(self.DIRECTIONS) + self.directions[ghost.getDirection()]
+            elif part == 'food':
+                food = state.getFood()
+                for x, y in self.foodCells:
+                    code = 2 * code + food[x][y]
+            elif part == 'capsules':
+                capsules = state.getCapsules()
+                for capsule in self.capsuleCells:
+                    code = 2 * code + (capsule in capsules)
+            elif part == 'scared':
+                for ghost in state.getGhostStates():
+                    code = 2 * code + (ghost.scaredTimer > 0)
+        return code
+
+class FeatureIndex:
+    """
+    Gives every feature name a fixed position in a dense feature vector.  A
+    name gets the next free position the first time an extractor produces
+    it, so vectors made earlier may be shorter than later ones.
+    """
+    def __init__(self, names=()):
+        self.indices = {}
+        self.names = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        "Returns the position of name, giving it the next free one if it is new."
+        if name not in self.indices:
+            self.indices[name] = len(self.names)
+            self.names.append(name)
+        return self.indices[name]
+
+    def vectorize(self, features):
+        "Returns the Counter of features as a NumPy vector."
+        for name in features:
+            self.add(name)
+        vector = np.zeros(len(self.names))
+        for name, value in features.items():
+            vector[self.indices[name]] = value
+        return vector
 
 class FeatureExtractor:
     def getFeatures(self, state, action):
@@ -46,10 +143,10 @@ def closestFood(pos, food, walls):
     closestFood -- this is similar to the function that we have
     worked on in the search project; here its all in one place
     """
-    fringe = [(pos[0], pos[1], 0)]
+    fringe = collections.deque([(pos[0], pos[1], 0)])
     expanded = set()
     while fringe:
-        pos_x, pos_y, dist = fringe.pop(0)
+        pos_x, pos_y, dist = fringe.popleft()
         if (pos_x, pos_y) in expanded:
             continue
         expanded.add((pos_x, pos_y))
@@ -63,6 +160,118 @@ def closestFood(pos, food, walls):
     # no food found
     return None
 
+class FoodDistanceField:
+    """
+    The maze distance from every cell to the closest food, so that
+    distances[x][y] is what closestFood((x, y), food, walls) returns.  It is
+    computed with one search started from all the food at once.
+    """
+    def __init__(self, food, walls):
+        self.walls = walls
+        self.distances = [[None] * walls.height for x in range(walls.width)]
+        fringe = []
+        for x in range(food.width):
+            for y in range(food.height):
+                if food[x][y]:
+                    self.distances[x][y] = 0
+                    fringe.append((0, x, y))
+        self._spread(fringe)
+
+    def copy(self):
+        field = FoodDistanceField.__new__(FoodDistanceField)
+        field.walls = self.walls
+        field.distances = [column[:] for column in self.distances]
+        return field
+
+    def _spread(self, fringe):
+        "Lowers the distances reachable from the (dist, x, y) entries of fringe."
+        distances, walls = self.distances, self.walls
+        heapq.heapify(fringe)
+        while fringe:
+            dist, x, y = heapq.heappop(fringe)
+            if dist > distances[x][y]:
+                continue
+            for nbr_x, nbr_y in Actions.getLegalNeighbors((x, y), walls):
+                nbrDist = distances[nbr_x][nbr_y]
+                if nbrDist is None or nbrDist > dist + 1:
+                    distances[nbr_x][nbr_y] = dist + 1
+                    heapq.heappush(fringe, (dist + 1, nbr_x, nbr_y))
+
+    def removeFood(self, position):
+        """
+        Updates the field after the food at position has been eaten.  Only
+        the cells for which this food was (one of) the closest are searched
+        again, starting from the distances of the cells around them.
+        """
+        distances, walls = self.distances, self.walls
+        region = set([position])
+        fringe = collections.deque([position])
+        while fringe:
+            x, y = fringe.popleft()
+            for nbr in Actions.getLegalNeighbors((x, y), walls):
+                if nbr not in region and distances[nbr[0]][nbr[1]] == distances[x][y] + 1:
+                    region.add(nbr)
+                    fringe.append(nbr)
+        for x, y in region:
+            distances[x][y] = None
+        border = []
+        for x, y in region:
+            nbrDists = [distances[nbr_x][nbr_y] for nbr_x, nbr_y in Actions.getLegalNeighbors((x, y), walls)]
+            nbrDists = [dist for dist in nbrDists if dist is not None]
+            if nbrDists:
+                distances[x][y] = min(nbrDists) + 1
+                border.append((distances[x][y], x, y))
+        self._spread(border)
+
+class FoodDistanceCache:
+    """
+    Keeps the FoodDistanceFields of the last few food grids.  The agents see
+    a fresh copy of the state every move, so fields are looked up by the
+    food itself; the field after a pellet was eaten is derived from the
+    field before.
+    """
+    def __init__(self, size=8):
+        self.size = size
+        self.fields = collections.OrderedDict()
+        self.walls = None
+        self.lastFood = None
+        self.lastField = None
+
+    def getField(self, state):
+        food = state.getFood()
+        # Most lookups are for the same state, once per legal action
+        if food.data is self.lastFood:
+            return self.lastField
+        walls = state.getWalls()
+        if self.walls is None or (walls.data is not self.walls.data and walls != self.walls):
+            self.fields.clear()
+        self.walls = walls
+
+        key = tuple(map(tuple, food.data))
+        field = self.fields.get(key)
+        if field is None:
+            field = self._fieldAfterEating(key, state) or FoodDistanceField(food, walls)
+            self.fields[key] = field
+            if len(self.fields) > self.size:
+                self.fields.popitem(last=False)
+        else:
+            self.fields.move_to_end(key)
+        self.lastFood, self.lastField = food.data, field
+        return field
+
+    def _fieldAfterEating(self, key, state):
+        # The ghosts have moved since, so the pellet can only be under pacman
+        x, y = map(int, state.getPacmanPosition())
+        if key[x][y]:
+            return None
+        previousKey = key[:x] + (key[x][:y] + (True,) + key[x][y+1:],) + key[x+1:]
+        previous = self.fields.get(previousKey)
+        if previous is None:
+            return None
+        field = previous.copy()
+        field.removeFood((x, y))
+        return field
+
 class SimpleExtractor(FeatureExtractor):
     """
     Returns simple features for a basic reflex Pacman:
@@ -72,6 +281,9 @@ class SimpleExtractor(FeatureExtractor):
     - whether a ghost is one step away
     """
 
+    def __init__(self):
+        self.foodDistances = FoodDistanceCache()
+
     def getFeatures(self, state, action):
         # extract the grid of food and wall locations and get the ghost locations
         food = state.getFood()
@@ -95,7 +307,7 @@ class SimpleExtractor(FeatureExtractor):
         if not features["#-of-ghosts-1-step-away"] and food[next_x][next_y]:
             features["eats-food"] = 1.0
 
-        dist = closestFood((next_x, next_y), food, walls)
+        dist = self.foodDistances.getField(state).distances[next_x][next_y]
         if dist is not None:
             # make the distance a number less than one otherwise the update
             # will diverge wildly
@@ -384,9 +384,12 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
-            self.colorFields = prevState.colorFields
+            self.showColorFields = prevState.showColorFields
+        else:
+            self.showColorFields = False
 
-        self.colorFields = list()
+        # Colour fields by coordinate, only kept if a display shows them
+        self.colorFields = dict()
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -409,19 +412,20 @@ class GameStateData:
         return state
 
     def addColorField(self,x,y,color):
-        field=dict()
-        field['color']=color
-        field['coordinate']=(x,y)
-        self.colorFields.append(field)
+        if self.showColorFields:
+            self.colorFields[(x,y)]=color
 
     def removeColorField(self,x,y):
-        for f in self.colorFields:
-            if f['coordinate'] == (x,y):
-                self.colorFields.remove(f)
-                break
+        self.colorFields.pop((x,y), None)
 
     def removeAllColorFields(self):
-        self.colorFields=list()
+        self.colorFields=dict()
+
+    def getColorFields(self):
+        """
+        Returns the colour fields in the order they were added.
+        """
+        return [{'color': color, 'coordinate': coordinate} for coordinate, color in self.colorFields.items()]
 
     def cutFrame(self,x,y,r):
 
@@ -675,6 +679,9 @@ class Game:
         """
         Main control loop for game play.
         """
+        # Colour fields are only kept up to date for a graphical display
+        if "checkNullDisplay" in dir(self.display):
+            self.state.data.showColorFields = not self.display.checkNullDisplay()
         self.display.initialize(self.state.data)
         self.numMoves = 0
         # val = input("Enter your value: ")
@@ -717,6 +724,7 @@ class Game:
 
         agentIndex = self.startingIndex
         numAgents = len( self.agents )
+        updateDisplay = timed('display.update')(self.display.update)
 
         while not self.gameOver:
             # Fetch the next agent
@@ -807,19 +815,13 @@ class Game:
                 self.state = self.state.generateSuccessor( agentIndex, action )
 
 
-            for c in observation.data.colorFields:
-                ok = True
-                for cs in self.state.data.colorFields:
-                    if cs['coordinate'] == c['coordinate']:
-                        ok=False
-                        break
-                if ok:
-                    self.state.data.colorFields.append(c)
+            for coordinate, color in observation.data.colorFields.items():
+                self.state.data.colorFields.setdefault(coordinate, color)
 
 
 
             # Change the display
-            self.display.update( self.state.data )
+            updateDisplay( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
 
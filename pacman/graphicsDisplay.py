@@ -205,7 +205,7 @@ class PacmanGraphics:
         layout = self.layout
         self.drawWalls(layout.walls)
         # set all background to black
-        self.background = self.drawBackground(state.colorFields)
+        self.background = self.drawBackground(state.getColorFields())
         self.food = self.drawFood(layout.food)
         self.capsules = self.drawCapsules(layout.capsules)
         refresh()
@@ -245,7 +245,7 @@ class PacmanGraphics:
             remove_from_screen(f)
 
         #draw colorFields
-        self.background = self.drawBackground(newState.colorFields)
+        self.background = self.drawBackground(newState.getColorFields())
 
 
         if self.agentImages[agentIndex][0].isPacman != agentState.isPacman: self.swapImages(agentIndex, agentState)
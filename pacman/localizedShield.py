@@ -1,536 +1,362 @@
-# import stormpy
-# import stormpy.core
-import os
-# import numpy
-import time
-from multiprocessing.dummy import Pool as ThreadPool
-from util import ShortestPath
-import tempfile
-from stormEncoder import StormEncoder
-import pickle
-import multiprocessing
-
-RIGHT = 0
-UP = 1
-LEFT = 2
-DOWN = 3
-TOP_RIGHT = 4
-TOP_LEFT = 5
-BOTTOM_RIGHT = 6
-BOTTOM_LEFT = 7
-STOP = 8
-
-STR_RIGHT = "r"
-STR_UP = "u"
-STR_LEFT = "l"
-STR_DOWN = "d"
-STR_STOP = "s"
-STR_TOP_RIGHT = "u-r"
-STR_TOP_LEFT = "u-l"
-STR_BOTTOM_RIGHT = "d-r"
-STR_BOTTOM_LEFT = "d-l"
-
-STEPS = 10  # number of steps we plan ahead
-STEPS_IN_ENCODING = True
-
-USE_CORRIDOR_ENCODING = True
+# localizedShield.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+localizedShield.py decides which actions of pacman (the forklift in the
+warehouse) are safe by looking a few steps ahead on the part of the
+layout pacman can see, instead of querying a shield computed for the
+whole layout beforehand.
+
+Pacman sees the cells it can reach within horizon steps.  A ghost (fork
+truck) seen there may move to any visible neighbour cell each step, and
+an action is safe if pacman can stay out of the cells the ghosts may be
+in for the next lookAhead steps.
+
+pacman/ and warehouse/ use the same engine: the two copies of this file
+are identical and must be kept that way.
+"""
+
+import logging
+
+import numpy as np
+
+# Cells of a visibility map, CELL_CHARS[cell] prints one
+CELL_UNSEEN = -1
+CELL_FREE = 0
+CELL_GHOST = 1
+CELL_PACMAN = 2
+CELL_CHARS = np.array(['.', 'G', 'P', '?'])
+
+# Actions in the order safe actions are listed, with the (row, column)
+# offset of the cell they lead to.  All but Stop move to a neighbour cell.
+ACTIONS = ["North", "West", "East", "South", "Stop"]
+ACTION_SHIFTS = {"North": (-1, 0), "West": (0, -1), "East": (0, 1), "South": (1, 0), "Stop": (0, 0)}
+MOVES = ACTIONS[:4]
+
+# Distance of the cells that cannot be reached
+UNREACHABLE = 2**31
+
+logger = logging.getLogger(__name__)
 
 
 class LocalizedShield:
-
-    def __init__(self, state,symX,symY):
-        # get board properties in
-        self.path_counter = []
-        self.shield = None
-        self.symX = symX
-        self.symY = symY
-        self.encoder = StormEncoder(state,symX,symY)
-
-
-    def getShield(self):
-        return self.shield
-
-    def setShield(self, shield):
-        self.shield = shield
-
-    def loadShield(self, filename):
-        self.shield = pickle.load(open(filename, "rb"))
-
-    def dumpShield(self, dump):
-        print("dumping current shield to file: " + dump)
-        pickle.dump(self.shield, open(dump, "wb"))
-
-
-    def prettyPrintShield(self):
-
-        print("\**********************************************************************")
-        print("\*************START SHIELD*********************************************")
-        print("\**********************************************************************")
-
-        for entry in self.shield:
-            init_pacman_x = entry[0]
-            init_pacman_y = entry[1]
-            dir_pacman = self.encoder.mapIntDirectionToString(entry[2])
-            init_ghost_x = entry[3]
-            init_ghost_y = entry[4]
-            dir_ghost = self.encoder.mapIntDirectionToString(entry[5])
-
-            if USE_CORRIDOR_ENCODING:
-                path_nr = entry[6]
-                prob = str(round(entry[7], 2))
-                # if entry[6]>0:
-                print(
-                    "Init Pacman: (%d,%d), Dir Pacman %s, Init Ghost: (%d,%d), Dir Ghost %s, path_n %d, Probability %s" % (
-                    init_pacman_x, init_pacman_y, dir_pacman, init_ghost_x, init_ghost_y, dir_ghost, path_nr, prob))
-
-            else:
-                prob = str(round(entry[6], 2))
-                if entry[6] > 0:
-                    print(
-                        "Init Pacman: (%d,%d), Dir Pacman %s, Init Ghost: (%d,%d), Dir Ghost %s, Probability %s" % (
-                        init_pacman_x, init_pacman_y, dir_pacman, init_ghost_x, init_ghost_y, dir_ghost, prob))
-
-        print("\**********************************************************************")
-        print("\*************END SHIELD*********************************************")
-        print("\**********************************************************************")
-
-
-
-    def agentsMoveTowardEachOther(self, next_pos_pacman, init_ghost, dir_ghost):
-
-        next_ghost = self.encoder.getNextGhostPosition(init_ghost, dir_ghost)
-        if self.encoder.isCrossing(next_ghost[0], next_ghost[1]):
-            return False
-
-        connecting_corr = self.encoder.getConnectingCorridorsViaPos(next_pos_pacman)
-
-        graph = ShortestPath(connecting_corr)
-        path = graph.findShortestPath(next_pos_pacman, init_ghost)
-        n_path = graph.findShortestPath(next_pos_pacman, next_ghost)
-
-        if len(path) > len(n_path):
-            return True
-        return False
-
-    def isCollisionAssured(self, init_pacman, next_dir_pacman, init_ghost, dir_ghost):
-
-        next_pos_pacman = self.encoder.getNextPosition(init_pacman, next_dir_pacman)
-
-        if next_pos_pacman[0] == init_ghost[0] and next_pos_pacman[1] == init_ghost[1]:  # pacman moved in ghost with first step
-            # print("Coll Assured: init_pacman, dir_pacman, init_ghosts, dir_ghosts", init_pacman, dir_pacman,init_ghosts, dir_ghosts)
-            return True
-
-        assert (not self.encoder.isWall(next_pos_pacman))
-
-        if self.encoder.isSameConnectingCorridor(next_pos_pacman, init_ghost):
-            if not self.encoder.isCrossing(init_ghost[0], init_ghost[1]):
-                if self.agentsMoveTowardEachOther(next_pos_pacman, init_ghost, dir_ghost):
-                    # print("Coll Assured: init_pacman, dir_pacman, init_ghosts, dir_ghosts", init_pacman, dir_pacman, init_ghosts, dir_ghosts)
-                    return True
-
-        return False
-
-    def ghostTooFarAway(self, init_pacman, init_ghost):
-
-        x_diff = abs(init_pacman[0] - init_ghost[0])
-        y_diff = abs(init_pacman[1] - init_ghost[1])
-
-        if x_diff + y_diff > 2 * STEPS:
-            return True
-        return False
-
-    def getSymmetricArguments(self, init_pacman, dir_pacman, init_ghosts, dir_ghosts):
-
-        if not self.symX and not self.symY:
-            return init_pacman, dir_pacman, init_ghosts, dir_ghosts
-
-        sym_init_ghosts = []
-        sym_dir_ghosts = []
-
-        max_x = self.encoder.getWidthOfLayout() - 2
-        max_y = self.encoder.getHeightOfLayout() - 2
-        middle_x = (max_x // 2) + 1
-        middle_y = (max_y // 2) + 1
-
-        sym_init_pac_x = -1
-        sym_init_pac_y = -1
-        sym_dir_pacman = -1
-        if self.symX and init_pacman[0] > middle_x:  # switch positions and directions of Pacman and Ghosts
-            # flip pos and dir of pacman
-            x_shift = init_pacman[0] - middle_x
-            sym_init_pac_x = middle_x - x_shift
-
-            if dir_pacman == RIGHT:
-                sym_dir_pacman = LEFT
-            if dir_pacman == LEFT:
-                sym_dir_pacman = RIGHT
-
-        if self.symY and init_pacman[1] > middle_y:
-            # flip pos and dir of pacman
-            y_shift = init_pacman[1] - middle_y
-            sym_init_pac_y = middle_y - y_shift
-
-            if dir_pacman == UP:
-                sym_dir_pacman = DOWN
-            if dir_pacman == DOWN:
-                sym_dir_pacman = UP
-
-        if sym_dir_pacman == -1:
-            sym_dir_pacman = dir_pacman
-
-        if sym_init_pac_x == -1:
-            sym_init_pac_x = init_pacman[0]
-        if sym_init_pac_y == -1:
-            sym_init_pac_y = init_pacman[1]
-
-        # switch dir of ghosts
-        for i in range(0, len(init_ghosts)):
-            sym_dir_ghost = STOP
-            if self.symX and init_pacman[0] > middle_x:
-                if dir_ghosts[i] == RIGHT:
-                    sym_dir_ghost = LEFT
-                if dir_ghosts[i] == LEFT:
-                    sym_dir_ghost = RIGHT
-
-            if self.symY and init_pacman[1] > middle_y:
-                if dir_ghosts[i] == UP:
-                    sym_dir_ghost = DOWN
-                if dir_ghosts[i] == DOWN:
-                    sym_dir_ghost = UP
-
-            if sym_dir_ghost == STOP:
-                sym_dir_ghost = dir_ghosts[i]
-
-            sym_dir_ghosts.append(sym_dir_ghost)
-
-        # switch pos of ghosts
-        for i in range(0, len(init_ghosts)):
-
-            sym_x_ghost = -1
-            if self.symX and init_pacman[0] > middle_x:
-                if init_ghosts[i][0] > middle_x:
-                    x_shift = init_ghosts[i][0] - middle_x
-                    sym_x_ghost = middle_x - x_shift
-
-                if init_ghosts[i][0] < middle_x:
-                    x_shift = middle_x - init_ghosts[i][0]
-                    sym_x_ghost = middle_x + x_shift
-            if sym_x_ghost == -1:
-                sym_x_ghost = init_ghosts[i][0]
-
-            sym_y_ghost = -1
-            if self.symY and init_pacman[1] > middle_y:
-                if init_ghosts[i][1] > middle_y:
-                    y_shift = init_ghosts[i][1] - middle_y
-                    sym_y_ghost = middle_y - y_shift
-
-                if init_ghosts[i][1] < middle_y:
-                    y_shift = middle_y - init_ghosts[i][1]
-                    sym_y_ghost = middle_y + y_shift
-            if sym_y_ghost == -1:
-                sym_y_ghost = init_ghosts[i][1]
-
-            sym_init_ghosts.append([sym_x_ghost, sym_y_ghost])
-
-        return [[sym_init_pac_x, sym_init_pac_y], sym_dir_pacman, sym_init_ghosts, sym_dir_ghosts]
-
-    def computeJointProbability(self, probs):
-
-        res = -1
-
-        if len(probs) == 1:
-            res = probs[0]
-
-        if len(probs) == 2:
-            res = probs[0] + probs[1] - probs[0] * probs[1]
-
-        if len(probs) == 3:
-            res = probs[0] + probs[1] + probs[2] - probs[0] * probs[1] - probs[0] * probs[2] - probs[1] * probs[2] + \
-                  probs[0] * probs[1] * probs[2]
-
-        if len(probs) == 4:
-            probs1 = probs[0] + probs[1] + probs[2] + probs[3]
-            probs2 = -probs[0] * probs[1] - probs[0] * probs[2] - probs[0] * probs[3] - probs[1] * probs[2] - probs[1] * \
-                     probs[3] - probs[2] * probs[3]
-            probs3 = probs[0] * probs[1] * probs[2] + probs[0] * probs[1] * probs[3] + probs[0] * probs[2] * probs[3] + \
-                     probs[1] * probs[2] * probs[3]
-            probs4 = -probs[0] * probs[1] * probs[2] * probs[3]
-            res = probs1 + probs2 + probs3 + probs4
-
-        assert (res >= 0)
-        return res
-
-
-    def getFromShieldProbabilityToGetEaten(self, init_pacman, next_dir_pacman, init_ghosts, dir_ghosts):
-
-        init_pacman, next_dir_pacman, init_ghosts, dir_ghosts = self.getSymmetricArguments(init_pacman, next_dir_pacman,
-                                                                                           init_ghosts, dir_ghosts)
-        next_pos_pacman = self.encoder.getNextPosition(init_pacman, next_dir_pacman)
-
-        assert (not self.encoder.isWall(init_pacman))
-        assert (len(init_ghosts) == len(dir_ghosts))
-        assert (not self.encoder.isWall(next_pos_pacman))
-
-        for i in range(0, len(init_ghosts)):
-            assert (not self.encoder.isWall(init_ghosts[i]))
-
-        for init_ghost in init_ghosts:
-            if init_ghost[0] == init_pacman[0] and init_ghost[1] == init_pacman[1]:
-                return 1.0
-
-        for i in range (0, len(init_ghosts)):
-            if self.isCollisionAssured(init_pacman, next_dir_pacman, init_ghosts[i], dir_ghosts[i]):
-                return 1.0
-
-        if USE_CORRIDOR_ENCODING:
-            probs_per_path = []  # path_nr [probs per ghost per path]
-
-            for rowcount in range(0, len(self.shield)):  # get current entry
-                r = self.shield[rowcount]
-                for ghost_nr in range(0, len(init_ghosts)):
-                    if r[0] == init_pacman[0] and r[1] == init_pacman[1] and r[2] == next_dir_pacman:
-                        if r[3] == init_ghosts[ghost_nr][0] and r[4] == init_ghosts[ghost_nr][1] and r[5] == dir_ghosts[ghost_nr]:
-                            path_nr = r[6]
-                            prob_for_path_for_ghost = r[7]
-
-                            # store entry in probs_per_path
-                            flag = False
-                            for rowcount_probs in range(0, len(probs_per_path)):  # get current entry
-                                r_probs = probs_per_path[rowcount_probs]
-
-                                if r_probs[0] == path_nr:
-                                    new_probs = r_probs[1] + [prob_for_path_for_ghost]
-                                    probs_per_path[rowcount_probs] = (path_nr, new_probs)
-                                    flag = True
-
-                            if not flag:  # create new list entry
-                                probs_per_path.append((path_nr, [prob_for_path_for_ghost]))
-
-            if len(probs_per_path) < len(self.encoder.computePaths(init_pacman, next_dir_pacman)):
-                return 0
-
-            probs = []
-            for path_nr in range(0, len(probs_per_path)):
-                probs.append(self.computeJointProbability(probs_per_path[path_nr][1]))
-            res_prob = min(probs)
-
-        else:
-            probs = []
-            for rowcount in range(0, len(self.shield)):  # get current entry
-                r = self.shield[rowcount]
-                for ghost_nr in range(0, len(init_ghosts)):
-                    if r[0] == init_pacman[0] and r[1] == init_pacman[1] and r[2] == next_dir_pacman:
-                        if r[3] == init_ghosts[ghost_nr][0] and r[4] == init_ghosts[ghost_nr][1] and r[5] == dir_ghosts[
-                            ghost_nr]:
-                            probs.append(r[6])
-
-            return(max(probs))
-
-        if res_prob < 0:
-            print(
-                "RESULT: init_pacman[0], init_pacman[1], dir_pacman, init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0], prob",
-                init_pacman[0], init_pacman[1], next_dir_pacman, init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0],
-                res_prob)
-
-        assert (res_prob >= 0)
-        return res_prob
-
-
-    def computeShieldEntry(self, init_pacman, next_dir_pacman, init_ghost, dir_ghost, prismStr):
-
-        # direction is always the direction the agent has when he arrived at trhe current position
-
-        assert (not self.encoder.isWall(init_pacman))
-
-        next_pos_pacman = self.encoder.getNextPosition(init_pacman, next_dir_pacman)
-        if self.encoder.isWall(next_pos_pacman):
-            return
-
-        if self.encoder.isWall(init_ghost):
-            return
-        if init_ghost[0] == init_pacman[0] and init_ghost[1] == init_pacman[1]:
+    """
+    The look-ahead shield.  What only depends on the walls is kept per wall
+    grid in WallTables, for when the walls are the same again.
+    """
+
+    def __init__(self, incremental=True, check=False):
+        """
+        incremental - work on the window seen from pacman's cell and reuse
+                      the windows and last answer of earlier steps (see
+                      incrementalSafeActions)
+        check       - also compute every answer from the whole layout and
+                      raise an exception if the two differ
+        """
+        self.incremental = incremental
+        self.check = check
+        self.walls = None
+        self.tables = {}
+        self.last = None
+
+    def setWalls(self, walls):
+        "Switches to the WallTables of a wall grid, making them if needed."
+        if self.walls is not None and self.walls == walls:
             return
-        if init_ghost[0] == next_pos_pacman[0] and init_ghost[1] == next_pos_pacman[1]:
-            return
-        if self.encoder.isWall(self.encoder.getPreviousPosition(init_ghost, dir_ghost)):
-            return
-        if self.isCollisionAssured(init_pacman, next_dir_pacman, init_ghost, dir_ghost):
-            return
-
-        #counts number of storm calls
-        self.counter += 1
-
-        if USE_CORRIDOR_ENCODING:
-            paths = self.encoder.computePaths(init_pacman, next_dir_pacman)
-
-            for path_nr in range(0, len(paths)):
-                prob = self.computeProbabilityToGetEaten(next_pos_pacman, next_dir_pacman, init_ghost, dir_ghost,
-                                                         prismStr, paths[path_nr])
-                if prob > 0:
-                    self.shield.append((init_pacman[0], init_pacman[1], next_dir_pacman, init_ghost[0],
-                                        init_ghost[1], dir_ghost, path_nr, prob))
+        self.walls = walls.copy()
+        if self.walls not in self.tables:
+            self.tables[self.walls] = WallTables(walls)
+        self.wallTables = self.tables[self.walls]
+
+    def getRowCol(self, position):
+        "Returns the (row, column) of a game position, row 0 at the top."
+        return self.wallTables.shape[0] - int(position[1]) - 1, int(position[0])
+
+    def getCell(self, position):
+        "Returns the flat index of the cell of a game position."
+        row, col = self.getRowCol(position)
+        return row * self.wallTables.shape[1] + col
+
+    def visibilityMap(self, state, horizon):
+        """
+        Returns the cells pacman can reach within horizon steps as an int
+        array (row 0 is the top of the layout) of CELL_FREE, CELL_GHOST and
+        CELL_PACMAN.  All other cells, walls included, are CELL_UNSEEN.
+        """
+        self.setWalls(state.getWalls())
+        pacman = self.getCell(state.getPacmanPosition())
+        visibility = np.where(self.wallTables.getDistances(pacman) <= horizon, CELL_FREE, CELL_UNSEEN)
+        for ghost in state.getGhostPositions():
+            cell = self.getCell(ghost)
+            if visibility[cell] != CELL_UNSEEN:
+                visibility[cell] = CELL_GHOST
+        visibility[pacman] = CELL_PACMAN
+        return visibility.reshape(self.wallTables.shape)
+
+    def getWindow(self, pacman, horizon):
+        """
+        Returns the LookAheadWindow seen from (row, column) pacman, kept per
+        cell, horizon and wall grid.
+        """
+        if (pacman, horizon) not in self.wallTables.windows:
+            self.wallTables.windows[(pacman, horizon)] = LookAheadWindow(self.wallTables.openCells, pacman, horizon)
+        return self.wallTables.windows[(pacman, horizon)]
+
+    def safeActions(self, state, lookAhead, horizon, legalActions=None):
+        """
+        Returns the legal actions of pacman that are safe for lookAhead
+        steps, and the safety margin of every legal action: how many steps
+        pacman can stay away from the ghosts it sees after taking it, with
+        lookAhead+1 for a safe action.  Without a look ahead every legal
+        action is safe.
+        """
+        if legalActions is None:
+            legalActions = state.getLegalPacmanActions()
+        if lookAhead <= 0:
+            return list(legalActions), dict((action, lookAhead+1) for action in legalActions)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Vis Map\n%s\n%s", state.getPacmanPosition(),
+                         "\n".join("".join(line) for line in CELL_CHARS[self.visibilityMap(state, horizon)]))
+
+        if not self.incremental:
+            return self.fullSafeActions(state, lookAhead, horizon, legalActions)
+        safe, margins = self.incrementalSafeActions(state, lookAhead, horizon, legalActions)
+        if self.check:
+            full = self.fullSafeActions(state, lookAhead, horizon, legalActions)
+            if full != (safe, margins):
+                raise Exception('Incremental look ahead gave %s %s instead of %s %s for\n%s' % (safe, margins, full[0], full[1], state))
+        return safe, margins
+
+    def fullSafeActions(self, state, lookAhead, horizon, legalActions):
+        "Computes safeActions from the visibility map of the whole layout."
+        visibility = self.visibilityMap(state, horizon)
+        pacman = self.getCell(state.getPacmanPosition())
+        shifts = self.wallTables.getShifts()
+
+        # The visible cells are numbered; targets[a] holds the number of the
+        # cell action ACTIONS[a] leads to from every visible cell, or n if
+        # it is not visible
+        cells = np.flatnonzero(visibility != CELL_UNSEEN)
+        n = len(cells)
+        numbers = np.full(self.wallTables.size+1, n)
+        numbers[cells] = np.arange(n)
+        targets = numbers[shifts[:, cells]]
+
+        ghost_maps = self.ghostMaps(targets, visibility.ravel()[cells] == CELL_GHOST, lookAhead)
+        safety = self.safetyMap(targets, ghost_maps, lookAhead)
+        return self.getMargins(safety[numbers[shifts[:, pacman]]], lookAhead, legalActions)
+
+    def incrementalSafeActions(self, state, lookAhead, horizon, legalActions):
+        """
+        Computes safeActions on the window seen from pacman's cell, so the
+        work depends on the horizon and not on the size of the layout.  The
+        window of a cell is kept, and so is the whole answer of the last
+        step for when pacman's cell and the ghost cells it sees did not
+        change.  Without a ghost in sight only the cells out of sight are
+        unsafe.
+        """
+        self.setWalls(state.getWalls())
+        window = self.getWindow(self.getRowCol(state.getPacmanPosition()), horizon)
+        n = window.n
+        # A ghost on pacman's cell is not seen, as in visibilityMap
+        ghosts = set(window.getNumber(self.getRowCol(ghost)) for ghost in state.getGhostPositions())
+        ghosts = tuple(sorted(ghosts - set([n, window.pacman])))
+        key = (window, ghosts, lookAhead, tuple(legalActions))
+        if self.last is not None and self.last[0] == key:
+            return list(self.last[1]), dict(self.last[2])
+
+        if ghosts:
+            ghost_set = np.zeros(n, dtype=bool)
+            ghost_set[list(ghosts)] = True
+            ghost_maps = self.ghostMaps(window.targets, ghost_set, lookAhead)
+            safety = self.safetyMap(window.targets, ghost_maps, lookAhead)
         else:
-            prob = self.computeProbabilityToGetEaten(next_pos_pacman, next_dir_pacman, init_ghost, dir_ghost,
-                                                     prismStr)
-
-            assert (prob >= 0)
-            self.shield.append((init_pacman[0], init_pacman[1], next_dir_pacman, init_ghost[0], init_ghost[1], dir_ghost, prob))
-
-        if self.counter%20==0:
-            print("Computed Shield entry so far: ", self.counter)
-            self.end = time.time()
-            print("time needed for the last 1 calls:", self.end - self.start)
-            self.start = time.time()
-
-    def returnWindowAroundPacman(self, pos_pacman):
-
-        x_left = pos_pacman[0] - 2 * STEPS
-        if x_left < 1:
-            x_left = 1
-
-        x_right = pos_pacman[0] + 2 * STEPS
-        if x_right >= self.encoder.getWidthOfLayout() - 1:
-            x_right = self.encoder.getWidthOfLayout() - 2
-
-        y_down = pos_pacman[1] - 2 * STEPS
-        if y_down < 1:
-            y_down = 1
-
-        y_above = pos_pacman[1] + 2 * STEPS
-        if y_above >= self.encoder.getHeightOfLayout() - 1:
-            y_above = self.encoder.getHeightOfLayout() - 2
-
-        return [x_left, x_right, y_down, y_above]
-
-
-    def computeShield(self, state, ghost_table):
-
-        self.prismStr = self.encoder.encodeModel(state, ghost_table)
-
-        self.shield = []
-
-        start_total_time = time.time()
-        self.counter = 1
-        self.start = time.time()
-
-        for init_pacman in self.encoder.getRelevantCrossings():
-            for next_dir_pacman in range(0, 4):
-                if not self.encoder.isWall(self.encoder.getNextPosition(init_pacman, next_dir_pacman)):
-                    window = self.returnWindowAroundPacman(init_pacman)
-                    for init_x_ghost in range(window[0], window[1] + 1):
-                        for init_y_ghost in range(window[2], window[3] + 1):
-                            for ghost_dir in range(0, 4):
-                                local_copy_of_prismStr = (self.prismStr + '.')[:-1]
-                                self.computeShieldEntry(init_pacman, next_dir_pacman, [init_x_ghost, init_y_ghost], ghost_dir,
-                                                        local_copy_of_prismStr)
-
-        end_total_time = time.time()
-        print("Total time needed to create the Shield:", end_total_time - start_total_time)
-
-        return self.shield
-
-    def computeProbabilityToGetEaten(self, init_pacman, dir_pacman, init_ghost, dir_ghost, prismStr, path=None):
-
-        prismStr = prismStr.replace("xP : [1..xSize] init x", "xP : [1..xSize] init " + str(init_pacman[0]))
-        prismStr = prismStr.replace("yP : [1..ySize] init x", "yP : [1..ySize] init " + str(init_pacman[1]))
-
-        if not USE_CORRIDOR_ENCODING:
-            prismStr = prismStr.replace("dP : [0 .. 3] init x", "dP : [0 .. 3] init " + str(dir_pacman))
-
-        prismStr = prismStr.replace("xG0 : [0..xSize] init x",
-                                    "xG0 : [0..xSize] init " + str(init_ghost[0]))
-        prismStr = prismStr.replace("yG0 : [0..ySize] init x",
-                                    "yG0 : [0..ySize] init " + str(init_ghost[1]))
-        prismStr = prismStr.replace("dG0 : [0..3] init x",
-                                    "dG0 : [0..3] init " + str(dir_ghost))
-
-        if USE_CORRIDOR_ENCODING:
-            assert (path != None)
-            path_str = ""
-            for i in range(0, len(path) - 1):
-                assert (not self.encoder.isWall(path[i]))
-                path_str += self.encoder.encodePacmanStatement(path[i][0], path[i][1], path[i + 1][0], path[i + 1][1]) + "\n"
-            prismStr = prismStr.replace("INSERT CURRENT PATH HERE", path_str)
-
-        res = self.invokeStorm(prismStr)
-
-        # if self.invokeStormToCheckDeadlock(prismStr):
-        #    print("Deadlock at ", init_pacman, dir_pacman, init_ghosts, dir_ghosts)
-        #    assert(False)
-
-        return res
-
-
-    def invokeStorm(self, mdpprog):
-
-        # write program to RAM
-        # print("writing prism program to RAM")
-        temp_name = next(tempfile._get_candidate_names())
-        file_name = "/dev/shm/prism-" + temp_name + ".nm"
-        text_file = open(file_name, "w")
-        text_file.write(mdpprog)
-        text_file.close()
-
-        # read program from RAM
-        # print("parse prism program from RAM")
-        program = stormpy.parse_prism_program(file_name)
-
-        # print("parse properties")
-        # prop = "Pmin=? [ F<=" + str((self.num_ghosts+1)*STEPS-1) +" \"crash\" ]"
-        prop = "Pmin=? [ F \"crash\" ]"
-        properties = stormpy.parse_properties_for_prism_program(prop, program, None)
-
-        # print("Build Model")
-        start = time.time()
-        model = stormpy.build_model(program, properties)
-        initial_state = model.initial_states[0]
-        end = time.time()
-        # print(end-start)
-
-        result = stormpy.model_checking(model, properties[0])
-        # print(result.at(initial_state))
-
-        #os.remove(file_name)
-
-        return result.at(initial_state)
-
-    def invokeStormToCheckDeadlock(self, mdpprog):
-
-        # write program to RAM
-        # print("writing prism program to RAM")
-        temp_name = next(tempfile._get_candidate_names())
-        file_name = "/dev/shm/prism-" + temp_name + ".nm"
-        text_file = open(file_name, "w")
-        text_file.write(mdpprog)
-        text_file.close()
-
-        # read program from RAM
-        # print("parse prism program from RAM")
-        program = stormpy.parse_prism_program(file_name)
-
-        # print("parse properties")
-        # prop = "Pmin=? [ F<=" + str((self.num_ghosts+1)*STEPS-1) +" \"crash\" ]"
-        prop = "Pmin=? [ F \"deadlock\" ]"
-        properties = stormpy.parse_properties_for_prism_program(prop, program, None)
-
-        # print("Build Model")
-        start = time.time()
-        model = stormpy.build_model(program, properties)
-        initial_state = model.initial_states[0]
-        end = time.time()
-        # print(end-start)
-
-        # print("model checking")
-        result = stormpy.model_checking(model, properties[0])
-        # print(result.at(initial_state))
-
-        if result.at(initial_state) != 0:
-            assert (False)
-
-        os.remove(file_name)
-
-        if result.at(initial_state) != 0:
-            return True
-        else:
-            return False
-
+            safety = np.full(n+1, lookAhead+1)
+            safety[n] = 1 if lookAhead > 1 else 2
+        safe, margins = self.getMargins(safety[window.pacmanTargets], lookAhead, legalActions)
+        self.last = (key, safe, margins)
+        return list(safe), dict(margins)
+
+    def ghostMaps(self, targets, ghost_set, lookAhead):
+        """
+        Returns ghost_maps[k] for k up to lookAhead: the visible cells a
+        ghost may be in after k steps, that is the visible neighbours of the
+        cells reachable in fewer steps.  ghost_set holds the ghosts' cells.
+        """
+        n = targets.shape[1]
+        ghost_maps = [ghost_set]
+        reach = np.append(ghost_set, False)
+        for i in range(lookAhead):
+            ghost_set = reach[targets[:len(MOVES)]].any(axis=0)
+            ghost_maps.append(ghost_set)
+            reach[:n] |= ghost_set
+        return ghost_maps
+
+    def safetyMap(self, targets, ghost_maps, lookAhead):
+        """
+        Returns for every visible cell (and n, for the cells out of sight)
+        how many steps pacman can stay away from the ghosts after moving
+        there, lookAhead+1 being safe.
+        """
+        n = targets.shape[1]
+        # pacman_maps[level]: how many steps pacman can stay away from the
+        # ghosts from each cell at this level (lookAhead+1 is safe).  Moves
+        # out of the visible cells count as caught at this level.
+        pacman_maps = np.zeros((lookAhead+1, n+1), dtype=int)
+        pacman_maps[lookAhead, :n] = np.where(ghost_maps[lookAhead], lookAhead, lookAhead+1)
+        pacman_maps[lookAhead, n] = lookAhead+1
+        # Only pacman_maps[1] is used, so level 0 is not computed
+        for level in range(lookAhead-1, 0, -1):
+            pacman_maps[level+1, n] = level
+            pacman_maps[level, :n] = pacman_maps[level+1][targets].max(axis=0)
+            pacman_maps[level, :n][ghost_maps[level]] = level
+            pacman_maps[level, n] = level
+        return pacman_maps[1]
+
+    def getMargins(self, actionSafety, lookAhead, legalActions):
+        """
+        Returns the safe legal actions and the margins of all legal actions,
+        given the safety of the cell every action in ACTIONS leads to.
+        """
+        safe = []
+        margins = {}
+        for a, action in enumerate(ACTIONS):
+            if action in legalActions:
+                margins[action] = int(actionSafety[a])
+                if margins[action] > lookAhead:
+                    safe.append(action)
+                    logger.debug("%s : %s", action, margins[action])
+        return safe, margins
+
+
+class WallTables:
+    """
+    What the shield keeps about one wall grid: its open cells (row 0 is the
+    top of the layout), the windows seen from its cells and, for the
+    computation on the whole layout, the cell every action leads to and the
+    distances from cells.  Cells are numbered by flat index; self.size
+    stands for a cell off the grid.
+    """
+
+    def __init__(self, walls):
+        self.openCells = np.flip(~np.array(walls.data, dtype=bool).T, axis=0)
+        self.shape = self.openCells.shape
+        self.size = self.openCells.size
+        self.windows = {}
+        self.shifts = None
+        self.neighbours = None
+        self.distances = {}
+
+    def getShifts(self):
+        "Returns shifts[a][cell], the cell action ACTIONS[a] leads to from cell."
+        if self.shifts is None:
+            rows, cols = self.shape
+            padded = np.full((rows+2, cols+2), self.size)
+            padded[1:-1, 1:-1] = np.arange(self.size).reshape(self.shape)
+            self.shifts = np.array([padded[1+dRow:rows+1+dRow, 1+dCol:cols+1+dCol].ravel()
+                                    for dRow, dCol in (ACTION_SHIFTS[action] for action in ACTIONS)])
+        return self.shifts
+
+    def getNeighbours(self):
+        """
+        Returns the open neighbours of every cell.  Walls get neighbours
+        too, as the forklift may stand in one (a package it just loaded).
+        In pacman they are never used.
+        """
+        if self.neighbours is None:
+            shifts = self.getShifts()
+            isOpen = np.append(self.openCells.ravel(), False)
+            self.neighbours = [[int(neighbour) for neighbour in shifts[:len(MOVES), cell] if isOpen[neighbour]]
+                               for cell in range(self.size)]
+        return self.neighbours
+
+    def getDistances(self, cell):
+        """
+        Returns the number of steps from cell to every cell, or UNREACHABLE.
+        Kept per cell.
+        """
+        if cell not in self.distances:
+            neighbours = self.getNeighbours()
+            distances = [UNREACHABLE] * self.size
+            distances[cell] = 0
+            frontier = [cell]
+            depth = 0
+            while frontier:
+                depth += 1
+                nextFrontier = []
+                for c in frontier:
+                    for neighbour in neighbours[c]:
+                        if distances[neighbour] == UNREACHABLE:
+                            distances[neighbour] = depth
+                            nextFrontier.append(neighbour)
+                frontier = nextFrontier
+            self.distances[cell] = np.array(distances)
+        return self.distances[cell]
+
+
+class LookAheadWindow:
+    """
+    The cells seen from one cell within a horizon.  They are found on a crop
+    of the layout, horizon rows and columns around the cell and padded with
+    walls, so nothing here depends on the size of the layout.
+
+    The seen cells are numbered 0..n-1, with n standing for the cells out of
+    sight.  targets[a] holds the number of the cell action ACTIONS[a] leads
+    to from every seen cell, pacmanTargets[a] the one it leads to from the
+    cell the window is seen from, which is number pacman.
+    """
+
+    def __init__(self, openCells, pacman, horizon):
+        rows, cols = openCells.shape
+        row, col = pacman
+        top, left = max(0, row-horizon), max(0, col-horizon)
+        bottom, right = min(rows, row+horizon+1), min(cols, col+horizon+1)
+        crop = np.zeros((bottom-top+2, right-left+2), dtype=bool)
+        crop[1:-1, 1:-1] = openCells[top:bottom, left:right]
+        # Layout row and column of crop[0, 0]
+        self.top, self.left = top-1, left-1
+        self.shape = crop.shape
+
+        # The cells within horizon steps, one step at a time.  The padding
+        # is closed, so no step leaves the crop.  Pacman's own cell counts
+        # even when it is a wall (a package the forklift just loaded).
+        seen = np.zeros(crop.shape, dtype=bool)
+        seen[row-self.top, col-self.left] = True
+        for step in range(horizon):
+            grown = seen.copy()
+            grown[1:] |= seen[:-1]
+            grown[:-1] |= seen[1:]
+            grown[:, 1:] |= seen[:, :-1]
+            grown[:, :-1] |= seen[:, 1:]
+            grown &= crop
+            grown[row-self.top, col-self.left] = True
+            if (grown == seen).all():
+                break
+            seen = grown
+
+        cells = np.flatnonzero(seen)
+        self.n = len(cells)
+        self.numbers = np.full(seen.size, self.n)
+        self.numbers[cells] = np.arange(self.n)
+        offsets = np.array([dRow * self.shape[1] + dCol for dRow, dCol in (ACTION_SHIFTS[action] for action in ACTIONS)])
+        self.targets = self.numbers[cells[np.newaxis, :] + offsets[:, np.newaxis]]
+        self.pacman = self.getNumber(pacman)
+        self.pacmanTargets = self.targets[:, self.pacman]
+
+    def getNumber(self, position):
+        "Returns the number of a (row, column) of the layout, n if not seen."
+        row, col = position[0] - self.top, position[1] - self.left
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return int(self.numbers[row * self.shape[1] + col])
+        return self.n
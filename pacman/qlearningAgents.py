@@ -15,10 +15,12 @@ from game import *
 from learningAgents import ReinforcementAgent
 from featureExtractors import *
 from shield import Shield
+from localizedShield import LocalizedShield
 from stormEncoder import StormEncoder
+from experienceReplay import ReplayBuffer
 import numpy as np
 
-import random, util, math, copy
+import random, util, math, copy, logging
  
 RIGHT = 0
 UP = 1
@@ -43,6 +45,11 @@ STR_STOP = "s"
 MAX_TIME_COLORED = 3
 PROB_LIMIT_SAFE_ACTION = 0.2
 
+logger = logging.getLogger(__name__)
+
+# Largest number of packed states for which the Q-table is a dense array
+DENSE_TABLE_SIZE = 2**20
+
 class QLearningAgent(ReinforcementAgent):
     """
       Q-Learning Agent
@@ -63,10 +70,42 @@ class QLearningAgent(ReinforcementAgent):
         - self.getLegalActions(state)
           which returns legal actions for a state
     """
-    def __init__(self, **args):
-        "You can initialize Q-values here..."
+    def __init__(self, stateParts=None, incrementalShield=1, checkShield=0, **args):
+        """
+        stateParts        - if set (e.g. pacman+ghosts+food), Q-values
+                            are kept per packed state code instead of
+                            per GameState, see PackedStateEncoder
+        incrementalShield - reuse the localized shield's work of earlier steps
+        checkShield       - compare that with a full recompute on every step
+        """
         ReinforcementAgent.__init__(self, **args)
         self.qValues = util.Counter()
+        self.shielder = None
+        self.encoder = None
+        self.stateParts = stateParts.split('+') if stateParts else None
+        self.localShield = LocalizedShield(int(incrementalShield) > 0, int(checkShield) > 0)
+        self.memoState = None
+        self.stepMemo = {}
+        self.stateEncoder = None
+        self.lastEncoded = (None, None)
+
+    def getStateCode(self, state):
+        """
+          Returns the packed code of a state.  The table is made when the
+          first state is seen: a dense array if there are at most
+          DENSE_TABLE_SIZE codes, otherwise a dict of rows.
+        """
+        if self.lastEncoded[0] is state:
+            return self.lastEncoded[1]
+        if self.stateEncoder is None:
+            self.stateEncoder = PackedStateEncoder(state, self.stateParts)
+            if self.stateEncoder.size <= DENSE_TABLE_SIZE:
+                self.qTable = np.zeros((self.stateEncoder.size, len(PackedStateEncoder.DIRECTIONS)))
+            else:
+                self.qTable = {}
+        code = self.stateEncoder.encode(state)
+        self.lastEncoded = (state, code)
+        return code
 
     def getQValue(self, state, action):
         """
@@ -74,7 +113,21 @@ class QLearningAgent(ReinforcementAgent):
           Should return 0.0 if we have never seen a state
           or the Q node value otherwise
         """
-        return self.qValues[(state,action)]
+        if self.stateParts is None:
+            return self.qValues[(state,action)]
+        code = self.getStateCode(state)
+        if isinstance(self.qTable, dict):
+            if code not in self.qTable: return 0.0
+        return float(self.qTable[code][self.stateEncoder.directions[action]])
+
+    def setQValue(self, state, action, value):
+        if self.stateParts is None:
+            self.qValues[(state,action)] = value
+            return
+        code = self.getStateCode(state)
+        if isinstance(self.qTable, dict) and code not in self.qTable:
+            self.qTable[code] = np.zeros(len(PackedStateEncoder.DIRECTIONS))
+        self.qTable[code][self.stateEncoder.directions[action]] = value
 
 
     def computeValueFromQValues(self, state):
@@ -106,8 +159,23 @@ class QLearningAgent(ReinforcementAgent):
 
         return valuesForActions.argMax()
 
+    def getStepMemo(self, state):
+        """
+          Returns a dict for what the shield decided about state.  getAction,
+          update and the colouring all ask about the same state object, so
+          it is kept until another state comes.
+        """
+        if self.memoState is not state:
+            self.memoState = state
+            self.stepMemo = {}
+        return self.stepMemo
+
     def getProbabilityFromShield(self, state):
 
+        memo = self.getStepMemo(state)
+        if 'probs' in memo:
+            return memo['probs']
+
         height = state.data.layout.height
 
         # get pos from pacman
@@ -143,9 +211,8 @@ class QLearningAgent(ReinforcementAgent):
             probs.append((RIGHT, prob_right))
         else:
             probs.append((RIGHT, -1))
-        print(x_pac, y_pac)
-        print(probs)
-        print(state)
+        logger.debug("%s %s\n%s\n%s", x_pac, y_pac, probs, state)
+        memo['probs'] = probs
         return probs
 
     def convertFromStormDirToPacDir(self, direction):
@@ -169,7 +236,7 @@ class QLearningAgent(ReinforcementAgent):
         for entry in probs:
             if entry[1] >=0 and entry[1] <= PROB_LIMIT_SAFE_ACTION:
                 safe_actions.append(self.convertFromStormDirToPacDir(entry[0]))
-        print(safe_actions)
+        logger.debug("%s", safe_actions)
         return safe_actions
 
     def getProbabilityFromShieldPerDirection(self, state, dir_pac):
@@ -205,224 +272,20 @@ class QLearningAgent(ReinforcementAgent):
         res = self.shielder.getFromShieldProbabilityToGetEaten([x_pac, y_pac], dir_pac, conv_pos_ghosts, dir_ghosts)
         return res
 
-    def getVisibilityMap(self, state):
-        horizon = self.horizon
-        # print("Hor", horizon, self.lookAhead)
-        height = state.data.layout.height
-        width = state.data.layout.width
-        # print(type(state.data.layout.layoutText))
-        layout = np.array([list(line) for line in state.data.layout.layoutText])
-        # layout = np.empty((height, width), dtype=char)
-        layout[True] = '.'
-        # print(layout)
-        # print(layout.shape)
-        walls = np.array(state.getWalls().data).T
-        # print(walls.shape)
-        walls = np.array([list(line) for line in walls])
-        layout[walls] = '%'
-        layout = np.flip(layout, axis=0)
-        # print("Walls")
-        # print(type(walls))
-        # print(walls)
-        ghosts = state.getGhostPositions()
-        for ghost in ghosts:
-            print(ghost)
-            layout[int(height - ghost[1]-1)][int(ghost[0])] = 'G'
-        # pacman = np.array(np.where(layout=='P')).T[0]
-        pacman = state.getPacmanPosition()
-        pacman = [height-int(pacman[1])-1, int(pacman[0])]
-        layout[pacman[0]][pacman[1]] = 'P'
-        # print("LL")
-        # print(layout.shape)
-        # print(layout)
-        visible = np.zeros(layout.shape)
-        min_depth = (layout!='%')+0.0
-        min_depth[min_depth == 1] = np.inf
-        # print(min_depth)
-        st = []
-        node = list(pacman)
-        # print(node)
-        node.append(0)
-        min_depth[node[0],node[1]] = 0
-        st.append(node)
-        while len(st) > 0:
-            top = st[-1]
-            if top[2] < horizon:
-                if top[0] > 0 and min_depth[top[0]-1][top[1]] > min_depth[top[0]][top[1]]+1:
-                    min_depth[top[0]-1, top[1]] = min_depth[top[0]][top[1]]+1
-                    node = [top[0]-1, top[1], top[2]+1]
-                    st.append(node)
-                elif top[1] > 0 and min_depth[top[0]][top[1]-1] > min_depth[top[0]][top[1]]+1:
-                    min_depth[top[0], top[1]-1] = min_depth[top[0]][top[1]]+1
-                    node = [top[0], top[1]-1, top[2]+1]
-                    st.append(node)
-                elif top[0] < layout.shape[0]-1 and min_depth[top[0]+1][top[1]] > min_depth[top[0]][top[1]]+1:
-                    min_depth[top[0]+1, top[1]] = min_depth[top[0]][top[1]]+1
-                    node = [top[0]+1, top[1], top[2]+1]
-                    st.append(node)
-                elif top[1] < layout.shape[1]-1 and min_depth[top[0]][top[1]+1] > min_depth[top[0]][top[1]]+1:
-                    min_depth[top[0], top[1]+1] = min_depth[top[0]][top[1]]+1
-                    node = [top[0], top[1]+1, top[2]+1]
-                    st.append(node)
-                else:
-                    visible[top[0], top[1]] = 1
-                    st.pop()
-            else:
-                visible[top[0], top[1]] = 1
-                st.pop()
-        final_visibility = layout
-        final_visibility[visible!=1] = '?'
-        # print(final_visibility)
-        return final_visibility
-    
-    def getSafeActions(self, state, actions, legalActions):
-        look_ahead = self.lookAhead
-        # np.array(np.where(layout=='P')).T
-        visibility_map = self.getVisibilityMap(state)
-        # pacman = (np.array(np.where(visibility_map=='P')).T)[0]
-        height = state.data.layout.height
-        pacman = state.getPacmanPosition()
-        pacman = [height-pacman[1]-1, pacman[0]]
-        safety_map = np.zeros(visibility_map.shape)
-        safety_map[visibility_map=='?'] = -1
-        safety_map[visibility_map=='G'] = 1
-        ghosts = np.array(np.where(visibility_map=='G')).T.tolist()
-        ghosts = [tuple(ghost) for ghost in ghosts]
-        # min_depth = (visibility_map!='?')+0.0
-        # min_depth[min_depth == 1] = np.inf
-        ghost_set =np.zeros(visibility_map.shape)
-        
-        print("Vis Map")
-        print(pacman)
-        for line in visibility_map:
-            print("".join(line))
-        for ghost in ghosts:
-            print(ghost)
-            ghost_set[ghost[0]][ghost[1]] = 1
-        
-        ghost_maps = []
-        ghost_maps.append(ghost_set)
-        for i in range(look_ahead+1):
-            prev_ghost_set = ghost_set
-            ghost_set = np.zeros(visibility_map.shape)
-            prev_ghosts = list(set(ghosts))
-            ghosts=[]
-            for ghost in prev_ghosts:
-                ghosts.append(ghost)
-                if ghost[0]>0 and visibility_map[ghost[0]-1][ghost[1]] != '?':
-                    ghost_set[ghost[0]-1][ghost[1]] = 1
-                    ghosts.append((ghost[0]-1, ghost[1]))
-                if ghost[1]>0 and visibility_map[ghost[0]][ghost[1]-1] != '?':
-                    ghost_set[ghost[0]][ghost[1]-1] = 1
-                    ghosts.append((ghost[0], ghost[1]-1))
-                if ghost[0]<ghost_set.shape[0]-1 and visibility_map[ghost[0]+1][ghost[1]] != '?':
-                    ghost_set[ghost[0]+1][ghost[1]] = 1
-                    ghosts.append((ghost[0]+1, ghost[1]))
-                if ghost[1]<ghost_set.shape[1]-1 and visibility_map[ghost[0]][ghost[1]+1] != '?':
-                    ghost_set[ghost[0]][ghost[1]+1] = 1
-                    ghosts.append((ghost[0], ghost[1]+1))
-            ghost_maps.append(ghost_set)
-
-        pacman_maps = np.zeros((look_ahead+1, visibility_map.shape[0], visibility_map.shape[1])      )  
-        # action_prob_map = []
-        # final_action_map = []
-        pacman_maps[look_ahead] = ghost_maps[look_ahead]*look_ahead
-        pacman_maps[look_ahead][pacman_maps[look_ahead] == 0] = look_ahead+1
-        level = look_ahead-1
-        
-        final_actions = []
-        while level >=0:
-            # cells = np.array(np.where(visibility_map!='?')).T.tolist()
-            pacman_safety_map = np.ones(visibility_map.shape)*level
-            # action_prob = {}
-            # final_action = np.copy(visibility_map)
-            for action in actions:
-                # action_safety_map = np.zeros(visibility_map.shape)
-                # for i in range(len(transition_prob[action])):
-
-                temp = np.zeros(visibility_map.shape)
-                b_check = np.ones(visibility_map.shape)
-                if action=="North":
-                    dist = 1
-                    axis = 0
-                    b_check[0][:] = 0
-                elif action=="West":
-                    dist = 1
-                    axis = 1
-                    b_check[:][0] = 0
-                elif action=="East":
-                    dist = -1
-                    axis = 1
-                    b_check[:][-1] = 0
-                elif action=="South":
-                    dist = -1
-                    axis = 0
-                    b_check[-1][:] = 0
-                elif action=="Stop":
-                    dist=0
-                    axis=0
-                else:
-                    print("INVALID ACTION")
-                vis_shift = np.roll(visibility_map, dist, axis=axis)
-                pacman_shift = np.roll(pacman_maps[level+1], dist,axis=axis)
-                # b_check = np.ones(visibility_map.shape)
-                # b_check[0][:] = 0
-                mask = np.logical_and(np.array(visibility_map!='?'), np.array(vis_shift != '?'))
-                mask = np.logical_and(mask, b_check)
-                # temp = (pacman_shift*(mask == True) + 1.0*np.array(mask==False))
-                temp = (pacman_shift*(mask == True) + np.ones(visibility_map.shape)*(mask==False)*level)
-                temp[visibility_map == '?'] = level
-                temp[ghost_maps[level] == 1] = level
-                # action_safety_map = np.maximum(action_safety_map, temp)
-                # action_safety_map += temp
-                    
-                pacman_safety_map = np.maximum(temp, pacman_safety_map)
-                # final_action[pacman_safety_map==action_safety_map] = action[0]
-                # action_prob[action] = action_safety_map
-            # final_action[visibility_map == '?'] = '?'
-            # print("Final Action: ")
-            # print(final_action)
-            # action_prob_map.insert(0, action_prob)     
-            # final_action_map.insert(0, final_action)
-            # pacman_safety_map[ghost_maps[level] == 1] = 1
-            # pacman_safety_map[visibility_map == '%'] = 4
-            # pacman_safety_map[visibility_map == '?'] = 1
-            # plt.imshow(pacman_safety_map)
-            # plt.colorbar()
-            # plt.tight_layout()
-            # plt.grid(linewidth=1)        
-            # plt.show()
-            pacman_maps[level] = pacman_safety_map                       
-            level -= 1
-            
-        if look_ahead > 0:
-            if "North" in legalActions and pacman[0] > 0 and pacman_maps[1][pacman[0]-1][pacman[1]] > look_ahead:
-                final_actions.append("North")
-                print("North :", pacman_maps[1][pacman[0]-1][pacman[1]])
-            if "West" in legalActions and pacman[1] > 0 and pacman_maps[1][pacman[0]][pacman[1]-1] > look_ahead:
-                final_actions.append("West")
-                print("West :", pacman_maps[1][pacman[0]][pacman[1]-1])
-            if "East" in legalActions and pacman[1] < pacman_maps[1].shape[1] -1 and pacman_maps[1][pacman[0]][pacman[1]+1] > look_ahead:
-                final_actions.append("East")
-                print("East :", pacman_maps[1][pacman[0]][pacman[1]+1])
-            if "South" in legalActions and pacman[0] < pacman_maps[1].shape[0] -1 and pacman_maps[1][pacman[0]+1][pacman[1]] > look_ahead:
-                final_actions.append("South")
-                print("South :", pacman_maps[1][pacman[0]+1][pacman[1]])
-            if "Stop" in legalActions and pacman_maps[1][pacman[0]][pacman[1]] > look_ahead:
-                final_actions.append("Stop")
-                print("Stop :", pacman_maps[1][pacman[0]][pacman[1]])
-        else:
-            final_actions = legalActions
-        print("GetSafeActions")
-        print(pacman)
-        print(state.getPacmanPosition())
-        print(state)
-        # print(visibility_map)
-        print(legalActions)
-        print(final_actions)
-        return final_actions
+    @util.timed('getSafeActions')
+    def getSafeActions(self, state, legalActions):
+        """
+          Returns the legal actions the localized shield finds safe for the
+          next self.lookAhead steps, see LocalizedShield.safeActions.
+        """
+        memo = self.getStepMemo(state)
+        if 'safeActions' not in memo:
+            memo['safeActions'], memo['margins'] = self.localShield.safeActions(state, self.lookAhead, self.horizon, legalActions)
+            logger.debug("GetSafeActions\n%s\n%s\n%s\n%s\n%s", state.getPacmanPosition(), state, legalActions, memo['margins'], memo['safeActions'])
+        return memo['safeActions']
 
 
+    @util.timed('getAction')
     def getAction(self, state):
         """
           Compute the action to take in the current state.  With
@@ -435,7 +298,6 @@ class QLearningAgent(ReinforcementAgent):
           HINT: To pick randomly from a list, use random.choice(list)!!!!!
         """
         # Pick Action
-        actions = ["North", "South", "East", "West", "Stop"]
         legalActions = self.getLegalActions(state)
         randomAction = random.choice(legalActions)
         bestAction = self.computeActionFromQValues(state)
@@ -449,7 +311,7 @@ class QLearningAgent(ReinforcementAgent):
         
         if self.localizedShield > 0:
             # if self.episodesSoFar > self.numGhostTraining:
-            safeActions = self.getSafeActions(state, actions, legalActions)
+            safeActions = self.getSafeActions(state, legalActions)
         elif self.shielder != None and self.withoutShield==0:
             if self.episodesSoFar > self.numGhostTraining:
                 if self.encoder.isCrossing(x_pac, y_pac):
@@ -479,14 +341,13 @@ class QLearningAgent(ReinforcementAgent):
         # print("State end")
 
         if util.flipCoin(curr_epsilon):
-            print("Random", randomAction)
-            print("State end")
+            logger.debug("Random %s\nState end", randomAction)
             return randomAction
         else:
-            print("Best", bestAction)
-            print("State end")
+            logger.debug("Best %s\nState end", bestAction)
             return bestAction
 
+    @util.timed('update')
     def update(self, state, action, nextState, reward):
         """
           The parent class calls this to observe a
@@ -499,9 +360,7 @@ class QLearningAgent(ReinforcementAgent):
 
         estimatedQ = reward + self.discount * self.computeValueFromQValues(nextState)
         runningQ = (1-self.alpha) * self.getQValue(state,action) + self.alpha * estimatedQ
-        self.qValues[(state,action)] = runningQ
-
-        self.prev.state = state
+        self.setQValue(state, action, runningQ)
 
     def getPolicy(self, state):
         return self.computeActionFromQValues(state)
@@ -540,6 +399,7 @@ class PacmanQAgent(QLearningAgent):
         QLearningAgent.__init__(self, **args)
 
 
+    @util.timed('getAction')
     def getAction(self, state):
         """
         Simply calls the getAction method of QLearningAgent and then
@@ -559,10 +419,21 @@ class ApproximateQAgent(PacmanQAgent):
        and update.  All other QLearningAgent functions
        should work as is.
     """
-    def __init__(self, extractor='IdentityExtractor', **args):
+    def __init__(self, extractor='IdentityExtractor', replaySize=0, replayBatch=32, replayEvery=4, replaySeed=0, **args):
+        """
+        replaySize    - number of transitions kept for experience replay (0 = off)
+        replayBatch   - number of transitions replayed per minibatch update
+        replayEvery   - number of steps between two minibatch updates
+        replaySeed    - seed of the minibatch sampling
+        """
         self.featExtractor = util.lookup(extractor, globals())()
         PacmanQAgent.__init__(self, **args)
-        self.weights = util.Counter()
+        self.replayBuffer = ReplayBuffer(int(replaySize), seed=int(replaySeed)) if int(replaySize) > 0 else None
+        self.replayBatch = int(replayBatch)
+        self.replayEvery = int(replayEvery)
+        self.replaySteps = 0
+        self.featureIndex = FeatureIndex()
+        self.weights = np.zeros(0)
         self.ghost_weights = util.Counter()
         self.counter = 0
         self.encoded = False
@@ -571,22 +442,167 @@ class ApproximateQAgent(PacmanQAgent):
         self.color_counter = 0
         self.encoder = None
         self.shielder = None
+        self.featureMemo = {}
+        # File holding the current shield, and whether to make the shield at
+        # the start of the next game (after loading a checkpoint)
+        self.shieldFile = None
+        self.resumeShield = False
+        # In an actor process: the transitions of the current game, which
+        # are learned from by the learner instead of by this agent
+        self.actorTransitions = None
+
+    def getCheckpoint(self, shieldFile):
+        """
+          Returns everything learned so far (weights, ghost model, episode
+          counters and the replay buffer) for a checkpoint.  The shield is
+          kept by file name: if it was neither loaded from nor dumped to a
+          file, it is dumped to shieldFile first.
+        """
+        if self.shielder and self.shielder.getShield() is not None and self.shieldFile is None:
+            self.shielder.dumpShield(shieldFile)
+            self.shieldFile = shieldFile
+        return {'episodesSoFar': self.episodesSoFar,
+                'accumTrainRewards': self.accumTrainRewards,
+                'accumTestRewards': self.accumTestRewards,
+                'featureNames': list(self.featureIndex.names),
+                'weights': self.weights.copy(),
+                'ghostTable': list(self.ghostTable),
+                'replayBuffer': self.replayBuffer,
+                'replaySteps': self.replaySteps,
+                'encoded': self.encoded,
+                'shieldFile': self.shieldFile}
+
+    def loadCheckpoint(self, checkpoint):
+        """
+          Continues from a dict of getCheckpoint.  The number of training
+          episodes is the one of this run, so a run can be resumed with more
+          training than the one the checkpoint was taken from.
+        """
+        self.episodesSoFar = checkpoint['episodesSoFar']
+        self.accumTrainRewards = checkpoint['accumTrainRewards']
+        self.accumTestRewards = checkpoint['accumTestRewards']
+        self.featureIndex = FeatureIndex(checkpoint['featureNames'])
+        self.weights = np.array(checkpoint['weights'])
+        self.ghostTable = list(checkpoint['ghostTable'])
+        replayBuffer = checkpoint['replayBuffer']
+        if self.replayBuffer is not None and replayBuffer is not None and replayBuffer.capacity == self.replayBuffer.capacity:
+            self.replayBuffer = replayBuffer
+            self.replaySteps = checkpoint['replaySteps']
+        # The shield (and the encoder) are made from the first state of the next game
+        self.encoded = False
+        self.shieldFile = checkpoint['shieldFile']
+        self.resumeShield = checkpoint['encoded']
+        if not self.isInTraining():
+            self.epsilon = 0.0
+            self.alpha = 0.0
+
+    def registerInitialState(self, state):
+        PacmanQAgent.registerInitialState(self, state)
+        if self.resumeShield and not self.localizedShield:
+            self.resumeShield = False
+            self.encodeLayout(state)
+            if self.shieldFile is not None:
+                print("Loading shield from file: " + self.shieldFile)
+                self.shielder.loadShield(self.shieldFile)
+
+    def encodeLayout(self, state):
+        "Makes the shield and the encoder of the layout of state."
+        self.encoded=True
+        self.shielder = Shield(state,self.symX,self.symY)
+        self.encoder = StormEncoder(state,self.symX,self.symY)
+
+    def setWeights(self, names, weights):
+        "Continues with the weights of the learner (the feature names give their order)."
+        self.featureIndex = FeatureIndex(names)
+        self.weights = np.array(weights)
+        self.featureMemo = {}
+
+    def learnFromActor(self, names, transitions):
+        """
+          Does the update of every transition recorded by an actor.  Vectors
+          of the actor are indexed by its feature names, so they are mapped
+          onto featureIndex first.
+        """
+        positions = np.array([self.featureIndex.add(name) for name in names], dtype=int)
+        if len(self.weights) < len(self.featureIndex):
+            self.weights = np.concatenate([self.weights, np.zeros(len(self.featureIndex) - len(self.weights))])
+
+        def remap(vector):
+            mapped = np.zeros(len(self.weights))
+            mapped[positions[:len(vector)]] = vector
+            return mapped
+
+        for features, nextFeatures, reward, terminal in transitions:
+            features = remap(features)
+            nextFeatures = [remap(vector) for vector in nextFeatures]
+            # Like getValue, a state without legal actions is worth 0
+            nextValue = max([vector.dot(self.weights) for vector in nextFeatures]) if nextFeatures else 0.0
+            difference = reward + self.discount * nextValue - features.dot(self.weights)
+            self.weights += self.alpha * difference * features
+            if self.replayBuffer is not None:
+                self.replayTransition(features, nextFeatures, reward, terminal)
 
     def getWeights(self):
-        return self.weights
+        "Returns the weights as a Counter from feature name to weight."
+        return util.Counter(zip(self.featureIndex.names, self.weights.tolist()))
+
+    def getFeatureVector(self, state, action):
+        """
+          Returns the features of (state, action) as a vector indexed by
+          featureIndex.  Within a step the same pair is asked for when
+          choosing the action, for getValue of the next state and in the
+          update itself, so the vectors of the last two states seen are
+          remembered (by state object).
+        """
+        memo = self.featureMemo.get(id(state))
+        if memo is None or memo[0] is not state:
+            memo = (state, {})
+            self.featureMemo[id(state)] = memo
+            if len(self.featureMemo) > 2:
+                del self.featureMemo[next(iter(self.featureMemo))]
+        vector = memo[1].get(action)
+        if vector is None:
+            features = self.featExtractor.getFeatures(state, action)
+            vector = memo[1][action] = self.featureIndex.vectorize(features)
+        return vector
+
+    def getFeatureMatrix(self, state, actions):
+        """
+          Returns one row of features per action, as long as the weight
+          vector (which grows along with featureIndex).
+        """
+        vectors = [self.getFeatureVector(state, action) for action in actions]
+        if len(self.weights) < len(self.featureIndex):
+            self.weights = np.concatenate([self.weights, np.zeros(len(self.featureIndex) - len(self.weights))])
+        matrix = np.zeros((len(vectors), len(self.weights)))
+        for row, vector in zip(matrix, vectors):
+            row[:len(vector)] = vector
+        return matrix
 
     def getQValue(self, state, action):
         """
           Should return Q(state,action) = w * featureVector
           where * is the dotProduct operator
         """
-        qValue = 0.0
-        features = self.featExtractor.getFeatures(state, action)
+        return float(self.getFeatureMatrix(state, [action])[0].dot(self.weights))
+
+    def getQValues(self, state, actions):
+        "Returns the Q-values of all actions with one matrix-vector product."
+        return self.getFeatureMatrix(state, actions).dot(self.weights)
 
-        for key in list(features.keys()):
-            qValue = qValue + self.weights[key] * features[key]
-        return qValue
+    def computeValueFromQValues(self, state):
+        actions = self.getLegalActions(state)
+        if len(actions) == 0:
+            return 0.0
+        return float(self.getQValues(state, actions).max())
 
+    def computeActionFromQValues(self, state, safeActions = None):
+        if safeActions == None:
+            safeActions = self.getLegalActions(state)
+        if len(safeActions) == 0:
+            return None
+        # argmax picks the first of equal values, like Counter.argMax
+        return safeActions[int(self.getQValues(state, safeActions).argmax())]
 
     def updateGhostTable(self, state, next_state):
 
@@ -712,21 +728,10 @@ class ApproximateQAgent(PacmanQAgent):
             next_state.data.removeAllColorFields()
             nh = self.encoder.neighborHood([x_pac, y_pac])
 
-            if not self.encoder.isWall(nh[0]):
-                prob = self.getProbabilityFromShieldPerDirection(state, DOWN)
-                next_state.data.addColorField(nh[0][0], height - nh[0][1] - 1, self.convertProbToColor(prob))
-
-            if not self.encoder.isWall(nh[1]):
-                prob = self.getProbabilityFromShieldPerDirection(state, UP)
-                next_state.data.addColorField(nh[1][0], height - nh[1][1] - 1, self.convertProbToColor(prob))
-
-            if not self.encoder.isWall(nh[2]):
-                prob = self.getProbabilityFromShieldPerDirection(state, LEFT)
-                next_state.data.addColorField(nh[2][0], height - nh[2][1] - 1, self.convertProbToColor(prob))
-
-            if not self.encoder.isWall(nh[3]):
-                prob = self.getProbabilityFromShieldPerDirection(state, RIGHT)
-                next_state.data.addColorField(nh[3][0], height - nh[3][1] - 1, self.convertProbToColor(prob))
+            probs = self.getProbabilityFromShield(state)
+            for (direction, prob), cell in zip(probs, nh):
+                if not self.encoder.isWall(cell):
+                    next_state.data.addColorField(cell[0], height - cell[1] - 1, self.convertProbToColor(prob))
 
             self.color_counter = 1
     
@@ -735,9 +740,8 @@ class ApproximateQAgent(PacmanQAgent):
         width = state.data.layout.width
         x_pac = height - state.getPacmanPosition()[1] - 1
         y_pac = state.getPacmanPosition()[0]
-        actions = ["North", "South", "East", "West", "Stop"]
         legalActions = self.getLegalActions(state)
-        safeActions = self.getSafeActions(state, actions, legalActions)
+        safeActions = self.getSafeActions(state, legalActions)
         # print("Col")
         # print(x_pac, y_pac)
         # print(legalActions)
@@ -757,7 +761,7 @@ class ApproximateQAgent(PacmanQAgent):
         next_state.data.removeAllColorFields()
         # nh = self.encoder.neighborHood([x_pac, y_pac])
         walls = state.getWalls()
-        print(walls)
+        logger.debug("%s", walls)
         
         layout = np.array([list(line) for line in state.data.layout.layoutText])
         # layout = np.empty((height, width), dtype=char)
@@ -788,13 +792,12 @@ class ApproximateQAgent(PacmanQAgent):
         self.color_counter = 1
 
 
+    @util.timed('update')
     def update(self, state, action, next_state, reward):
 
         if not self.localizedShield:            
             if not self.encoded:
-                self.encoded=True
-                self.shielder = Shield(state,self.symX,self.symY)
-                self.encoder = StormEncoder(state,self.symX,self.symY)
+                self.encodeLayout(state)
 
             #use shield to dertermine safe actions
             if self.episodesSoFar > self.numGhostTraining:
@@ -812,13 +815,40 @@ class ApproximateQAgent(PacmanQAgent):
                 #     #safe_actions = self.getSafeActionsFromShield(state, next_state)
                 #     self.colorInCrossing(state, next_state)
 
+        if self.actorTransitions is not None:
+            # Actors only record the transition, the learner updates the weights
+            nextActions = self.getLegalActions(next_state)
+            self.actorTransitions.append((self.getFeatureVector(state, action),
+                                          [self.getFeatureVector(next_state, nextAction) for nextAction in nextActions],
+                                          reward, next_state.isWin() or next_state.isLose()))
+            return
+
         #update weights based on transition
 
         difference = reward + self.discount * self.getValue(next_state) - self.getQValue(state, action)
 
-        features = self.featExtractor.getFeatures(state, action)
-        for key in list(features.keys()):
-            self.weights[key] = self.weights[key] + self.alpha * difference * features[key]
+        features = self.getFeatureMatrix(state, [action])[0]
+        self.weights += self.alpha * difference * features
+
+        if self.replayBuffer is not None and self.isInTraining():
+            self.replay(state, action, next_state, reward)
+
+    def replay(self, state, action, next_state, reward):
+        """
+          Stores the transition in the replay buffer and every replayEvery
+          steps learns from a minibatch of stored transitions.
+        """
+        nextActions = self.getLegalActions(next_state)
+        self.replayTransition(self.getFeatureVector(state, action),
+                              [self.getFeatureVector(next_state, nextAction) for nextAction in nextActions],
+                              reward, next_state.isWin() or next_state.isLose())
+
+    def replayTransition(self, features, nextFeatures, reward, terminal):
+        "Stores a featurized transition, and learns from a minibatch every replayEvery steps."
+        self.replayBuffer.add(features, nextFeatures, reward, terminal)
+        self.replaySteps += 1
+        if self.replaySteps % self.replayEvery == 0 and len(self.replayBuffer) >= self.replayBatch:
+            self.replayBuffer.update(self.weights, self.alpha, self.discount, self.replayBatch)
 
 
     # Retuns in what direction Pacman is in relation to the Ghost
@@ -953,6 +983,7 @@ class ApproximateQAgent(PacmanQAgent):
             if self.episodesSoFar==1 and len(self.open)!=0:
                 print("Loading shield from file: " + self.open)
                 self.shielder.loadShield(self.open)
+                self.shieldFile = self.open
                 self.episodesSoFar=self.numGhostTraining+1
                 self.shielder.prettyPrintShield()
 
@@ -969,6 +1000,7 @@ class ApproximateQAgent(PacmanQAgent):
                 if len(self.dump)>0:
                     print("dumping current shield to file: "+self.dump)
                     self.shielder.dumpShield(self.dump)
+                    self.shieldFile = self.dump
 
                 self.shielder.prettyPrintShield()
 
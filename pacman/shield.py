@@ -1,15 +1,19 @@
 import stormpy
 import stormpy.core
+import logging
 import os
 import numpy
 import time
 from multiprocessing.dummy import Pool as ThreadPool
 from util import ShortestPath
+from util import timed
 import tempfile
 from stormEncoder import StormEncoder
 import pickle
 import multiprocessing
 
+logger = logging.getLogger(__name__)
+
 RIGHT = 0
 UP = 1
 LEFT = 2
@@ -261,6 +265,7 @@ class Shield:
         return res
 
 
+    @timed('shield')
     def getFromShieldProbabilityToGetEaten(self, init_pacman, next_dir_pacman, init_ghosts, dir_ghosts):
 
         init_pacman, next_dir_pacman, init_ghosts, dir_ghosts = self.getSymmetricArguments(init_pacman, next_dir_pacman,
@@ -327,10 +332,10 @@ class Shield:
             return(max(probs))
 
         if res_prob < 0:
-            print(
-                "RESULT: init_pacman[0], init_pacman[1], dir_pacman, init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0], prob",
-                init_pacman[0], init_pacman[1], next_dir_pacman, init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0],
-                res_prob)
+            logger.error(
+                "RESULT: init_pacman[0], init_pacman[1], dir_pacman, init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0], prob"
+                " %s %s %s %s %s %s %s", init_pacman[0], init_pacman[1], next_dir_pacman, init_ghosts[0][0],
+                init_ghosts[0][1], dir_ghosts[0], res_prob)
 
         assert (res_prob >= 0)
         return res_prob
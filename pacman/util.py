@@ -16,6 +16,7 @@ import sys
 import inspect
 import heapq, random
 import io
+import logging, logging.handlers
 import networkx as nx
 
 class FixedRandom:
@@ -621,7 +622,92 @@ class TimeoutFunction:
                 self.handle_timeout(None, None)
         return result
 
+class PhaseTimer:
+    """
+    Accumulates the time spent in named phases of a game step (getAction,
+    update, shield queries, ...), see timed.  Nothing is measured unless
+    enabled is set.  Nested calls of the same phase are only counted once;
+    times of different phases are inclusive, so a shield query made inside
+    getAction is part of both.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.depth = Counter()
+        self.calls = Counter()
+        self.seconds = Counter()
+        self.episodes = []
+
+    def start(self, phase):
+        self.depth[phase] += 1
+        return time.perf_counter()
+
+    def stop(self, phase, startTime):
+        self.depth[phase] -= 1
+        if self.depth[phase] == 0:
+            self.calls[phase] += 1
+            self.seconds[phase] += time.perf_counter() - startTime
+
+    def endEpisode(self):
+        """
+        Closes the current episode and returns its timings as a dictionary
+        phase -> {'calls': ..., 'seconds': ...}.
+        """
+        if not self.enabled:
+            return None
+        episode = dict((phase, {'calls': self.calls[phase], 'seconds': self.seconds[phase]}) for phase in sorted(self.calls))
+        self.episodes.append(episode)
+        self.calls = Counter()
+        self.seconds = Counter()
+        return episode
+
+    def addEpisode(self, episode):
+        "Adds the timings of an episode that was played in another process."
+        if episode is not None:
+            self.episodes.append(episode)
+
+    def write(self, fileName):
+        """
+        Writes the per episode timings to fileName.json and fileName.csv.
+        """
+        import json, csv
+        phases = sorted(set(phase for episode in self.episodes for phase in episode))
+        total = {}
+        for phase in phases:
+            timings = [episode[phase] for episode in self.episodes if phase in episode]
+            total[phase] = {'calls': sum(t['calls'] for t in timings), 'seconds': sum(t['seconds'] for t in timings)}
+        with open(fileName + '.json', 'w') as f:
+            json.dump({'phases': phases, 'episodes': self.episodes, 'total': total}, f, indent=1)
+        with open(fileName + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['episode', 'phase', 'calls', 'seconds'])
+            for i, episode in enumerate(self.episodes):
+                for phase in phases:
+                    if phase in episode:
+                        writer.writerow([i, phase, episode[phase]['calls'], '%.6f' % episode[phase]['seconds']])
+
+TIMER = PhaseTimer()
+
+def timed(phase):
+    """
+    Decorator that adds the time spent in the decorated function to the
+    given phase of TIMER.
 
+      @timed('getAction')
+      def getAction(self, state): ...
+    """
+    def decorate(function):
+        def wrapper(*args, **keyArgs):
+            if not TIMER.enabled:
+                return function(*args, **keyArgs)
+            startTime = TIMER.start(phase)
+            try:
+                return function(*args, **keyArgs)
+            finally:
+                TIMER.stop(phase, startTime)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorate
 
 _ORIGINAL_STDOUT = None
 _ORIGINAL_STDERR = None
@@ -651,6 +737,41 @@ def unmutePrint():
     sys.stdout = _ORIGINAL_STDOUT
     #sys.stderr = _ORIGINAL_STDERR
 
+class StdoutHandler(logging.StreamHandler):
+    """
+    A StreamHandler that always writes to the current sys.stdout, so log
+    records follow mutePrint and redirected output like print does.
+    """
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+_LOG_BUFFER = None
+
+def configureLogging(level='WARNING', capacity=1000):
+    """
+    Sends log records of the given level to stdout.  Records are buffered
+    and only written out when the buffer is full, on a warning, or when
+    flushLogging is called, so debug output does not stall every move.
+    """
+    global _LOG_BUFFER
+    root = logging.getLogger()
+    if _LOG_BUFFER is not None:
+        root.removeHandler(_LOG_BUFFER)
+    target = StdoutHandler()
+    target.setFormatter(logging.Formatter('%(message)s'))
+    _LOG_BUFFER = logging.handlers.MemoryHandler(capacity, flushLevel=logging.WARNING, target=target)
+    root.addHandler(_LOG_BUFFER)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+def flushLogging():
+    "Writes out the buffered log records, e.g. at the end of a game."
+    if _LOG_BUFFER is not None:
+        _LOG_BUFFER.flush()
+
 class ShortestPath:
     def __init__(self, corrs):
         self.g = nx.Graph()
@@ -0,0 +1,267 @@
+# vectorizedGame.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+vectorizedGame.py runs many Pacman games on the same layout in lockstep.
+
+The whole batch is kept in NumPy arrays (positions, directions, scared
+timers, food and capsules) and the classic rules of pacman.py
+(PacmanRules and GhostRules) are applied to all games at once.  This is
+meant for collecting ghost statistics and for evaluating policies over
+thousands of short rollouts without building a GameState per move.
+
+Positions are stored in half cells, since scared ghosts move with half
+speed.  Actions are stored as indices into ACTIONS.
+
+  >>> games = VectorizedGame(layout.getLayout('smallGrid'), 1000, [VectorizedDirectionalGhost()])
+  >>> scores, wins = games.runEpisodes()
+"""
+
+import numpy as np
+
+from game import Directions
+from pacman import SCARED_TIME, COLLISION_TOLERANCE, TIME_PENALTY
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+NORTH, SOUTH, EAST, WEST, STOP = range(5)
+REVERSE = np.array([SOUTH, NORTH, WEST, EAST, STOP])
+VECTORS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)])
+
+
+class VectorizedGame:
+    """
+    A batch of numGames games of classic Pacman played on one layout.
+
+    ghostPolicies holds one policy per ghost (see VectorizedRandomGhost and
+    VectorizedDirectionalGhost), a single policy is used for every ghost.
+    """
+
+    def __init__(self, layout, numGames, ghostPolicies, numGhosts=None, seed=None, maxMoves=None):
+        self.layout = layout
+        self.numGames = numGames
+        self.maxMoves = maxMoves
+        self.random = np.random.default_rng(seed)
+
+        if numGhosts is None:
+            numGhosts = layout.getNumGhosts()
+        agentPositions = [pos for isPacman, pos in layout.agentPositions if isPacman]
+        agentPositions += [pos for isPacman, pos in layout.agentPositions if not isPacman][:numGhosts]
+        self.numGhosts = len(agentPositions) - 1
+        if not isinstance(ghostPolicies, (list, tuple)):
+            ghostPolicies = [ghostPolicies]
+        if len(ghostPolicies) == 1:
+            ghostPolicies = list(ghostPolicies) * self.numGhosts
+        self.ghostPolicies = ghostPolicies
+
+        self.walls = np.array(layout.walls.data, dtype=bool)
+        self.startPositions = 2 * np.array(agentPositions, dtype=int)
+        self.capsulePositions = np.array(layout.capsules, dtype=int).reshape(-1, 2)
+        self.reset()
+
+    def reset(self):
+        """
+        Puts every game of the batch back into the start configuration.
+        """
+        K, A = self.numGames, self.numGhosts + 1
+        self.positions = np.tile(self.startPositions[None, :, :], (K, 1, 1))
+        self.directions = np.full((K, A), STOP, dtype=int)
+        self.scaredTimers = np.zeros((K, A), dtype=int)
+        self.food = np.tile(np.array(self.layout.food.data, dtype=bool)[None, :, :], (K, 1, 1))
+        self.numFood = self.food.reshape(K, -1).sum(axis=1)
+        self.capsules = np.ones((K, len(self.capsulePositions)), dtype=bool)
+        self.scores = np.zeros(K, dtype=int)
+        self.wins = np.zeros(K, dtype=bool)
+        self.loses = np.zeros(K, dtype=bool)
+        self.moves = np.zeros(K, dtype=int)
+        self.lastActions = np.full((K, A), STOP, dtype=int)
+
+    def isDone(self):
+        done = self.wins | self.loses
+        if self.maxMoves is not None:
+            done = done | (self.moves >= self.maxMoves)
+        return done
+
+    def getLegalActions(self, agentIndex):
+        """
+        Returns a (numGames, 5) boolean mask of the legal actions of an agent,
+        following Actions.getPossibleActions and GhostRules.getLegalActions.
+        """
+        pos = self.positions[:, agentIndex]
+        direction = self.directions[:, agentIndex]
+        onGrid = (pos % 2 == 0).all(axis=1)
+        cell = pos // 2
+        # Same bounds as Actions.getPossibleActions, which lets -1 wrap around
+        width, height = self.walls.shape
+        x = cell[:, 0, None] + VECTORS[None, :, 0]
+        y = cell[:, 1, None] + VECTORS[None, :, 1]
+        inside = (x < width) & (y < height)
+        x, y = x % width, y % height
+        legal = inside & ~self.walls[x, y]
+
+        # Agents between two cells can only keep on moving
+        offGrid = np.zeros_like(legal)
+        offGrid[np.arange(len(pos)), direction] = True
+        legal = np.where(onGrid[:, None], legal, offGrid)
+
+        if agentIndex > 0:
+            legal[:, STOP] = False
+            reverse = np.zeros_like(legal)
+            reverse[np.arange(len(pos)), REVERSE[direction]] = True
+            dropReverse = reverse & legal & (legal.sum(axis=1) > 1)[:, None]
+            legal &= ~dropReverse
+        return legal
+
+    def chooseActions(self, distributions):
+        """
+        Samples one action per game from a (numGames, 5) array of weights.
+        """
+        total = distributions.sum(axis=1, keepdims=True)
+        total[total == 0] = 1
+        cumulative = np.cumsum(distributions / total, axis=1)
+        r = self.random.random((len(distributions), 1))
+        actions = (cumulative < r).sum(axis=1)
+        actions[distributions.sum(axis=1) == 0] = STOP
+        return np.minimum(actions, STOP)
+
+    def step(self, pacmanActions):
+        """
+        Plays one round (pacman followed by every ghost) in all running games.
+        Returns the score change of the round for every game.
+        """
+        active = ~self.isDone()
+        scoresBefore = self.scores.copy()
+        self.lastActions[active] = STOP
+        self.moves[active] += 1
+
+        self.applyPacmanAction(np.asarray(pacmanActions), active.copy())
+        for index in range(1, self.numGhosts + 1):
+            active &= ~(self.wins | self.loses)
+            if not active.any():
+                break
+            distributions = self.ghostPolicies[index - 1].getDistribution(self, index)
+            actions = self.chooseActions(distributions)
+            self.applyGhostAction(actions, index, active)
+        return self.scores - scoresBefore
+
+    def applyPacmanAction(self, actions, active):
+        games = np.nonzero(active)[0]
+        if len(games) == 0:
+            return
+        actions = actions[games]
+        self.lastActions[games, 0] = actions
+        self.positions[games, 0] += 2 * VECTORS[actions]
+        moving = actions != STOP
+        self.directions[games[moving], 0] = actions[moving]
+        self.scores[games] -= TIME_PENALTY
+
+        x, y = (self.positions[games, 0] // 2).T
+        eaten = self.food[games, x, y]
+        self.food[games[eaten], x[eaten], y[eaten]] = False
+        self.numFood[games[eaten]] -= 1
+        self.scores[games[eaten]] += 10
+        cleared = eaten & (self.numFood[games] == 0) & ~self.loses[games]
+        self.scores[games[cleared]] += 500
+        self.wins[games[cleared]] = True
+
+        if len(self.capsulePositions):
+            onCapsule = (self.capsulePositions[None, :, 0] == x[:, None]) & \
+                        (self.capsulePositions[None, :, 1] == y[:, None]) & self.capsules[games]
+            ate = onCapsule.any(axis=1)
+            self.capsules[games] &= ~onCapsule
+            self.scaredTimers[games[ate], 1:] = SCARED_TIME
+
+        for index in range(1, self.numGhosts + 1):
+            self.checkDeath(games, index)
+
+    def applyGhostAction(self, actions, index, active):
+        games = np.nonzero(active)[0]
+        actions = actions[games]
+        self.lastActions[games, index] = actions
+        scared = self.scaredTimers[games, index] > 0
+        speed = np.where(scared, 1, 2)
+        self.positions[games, index] += speed[:, None] * VECTORS[actions]
+        moving = actions != STOP
+        self.directions[games[moving], index] = actions[moving]
+
+        timers = self.scaredTimers[games, index]
+        snap = games[timers == 1]
+        self.positions[snap, index] = 2 * ((self.positions[snap, index] + 1) // 2)
+        self.scaredTimers[games, index] = np.maximum(0, timers - 1)
+        self.checkDeath(games, index)
+
+    def checkDeath(self, games, index):
+        distance = np.abs(self.positions[games, index] - self.positions[games, 0]).sum(axis=1)
+        collide = games[distance <= 2 * COLLISION_TOLERANCE]
+        scared = self.scaredTimers[collide, index] > 0
+        eaten = collide[scared]
+        self.scores[eaten] += 200
+        self.positions[eaten, index] = self.startPositions[index]
+        self.directions[eaten, index] = STOP
+        self.scaredTimers[eaten, index] = 0
+        killed = collide[~scared & ~self.wins[collide]]
+        self.scores[killed] -= 500
+        self.loses[killed] = True
+
+    def runEpisodes(self, pacmanPolicy=None):
+        """
+        Plays all games of the batch until they are over and returns the
+        final scores and the wins.  pacmanPolicy maps the batch to one action
+        index per game; by default pacman moves uniformly at random.
+        """
+        if pacmanPolicy is None:
+            pacmanPolicy = VectorizedRandomPacman()
+        self.reset()
+        while not self.isDone().all():
+            self.step(pacmanPolicy.getActions(self))
+        return self.scores.copy(), self.wins.copy()
+
+
+class VectorizedRandomPacman:
+    "A pacman that chooses a legal action uniformly at random."
+
+    def getActions(self, games):
+        return games.chooseActions(games.getLegalActions(0).astype(float))
+
+
+class VectorizedRandomGhost:
+    "A ghost that chooses a legal action uniformly at random."
+
+    def getDistribution(self, games, index):
+        return games.getLegalActions(index).astype(float)
+
+
+class VectorizedDirectionalGhost:
+    "A ghost that prefers to rush Pacman, or flee when scared."
+
+    def __init__(self, prob_attack=0.7, prob_scaredFlee=0.8):
+        self.prob_attack = prob_attack
+        self.prob_scaredFlee = prob_scaredFlee
+
+    def getDistribution(self, games, index):
+        legal = games.getLegalActions(index)
+        scared = games.scaredTimers[:, index] > 0
+        speed = np.where(scared, 1, 2)
+
+        newPositions = games.positions[:, index, None, :] + speed[:, None, None] * VECTORS[None, :, :]
+        distances = np.abs(newPositions - games.positions[:, 0, None, :]).sum(axis=2)
+        # Illegal actions never count as best action
+        closest = np.where(legal, distances, np.iinfo(int).max).min(axis=1)
+        furthest = np.where(legal, distances, -1).max(axis=1)
+        bestScore = np.where(scared, furthest, closest)
+        bestProb = np.where(scared, self.prob_scaredFlee, self.prob_attack)
+        best = legal & (distances == bestScore[:, None])
+
+        numLegal = np.maximum(legal.sum(axis=1, keepdims=True), 1)
+        numBest = np.maximum(best.sum(axis=1, keepdims=True), 1)
+        return best * (bestProb[:, None] / numBest) + legal * ((1 - bestProb[:, None]) / numLegal)
@@ -95,6 +95,9 @@ class ForkTruckPath(GhostAgent):
     probability = {1: util.Counter({0: 1.0}), 2: util.Counter({0: 0.8, 1: 0.2}),
                    3: util.Counter({0: 0.7, 1: 0.2, 2: 0.1}), 4: util.Counter({0: 0.6, 1: 0.2, 2: 0.1, 3: 0.1}),
                    5: util.Counter({0: 0.6, 1: 0.2, 2: 0.1, 3: 0.05, 4: 0.05})}
+    # The moves of a fork truck are certain, so their distributions are shared
+    actionDistributions = dict((action, util.Counter({action: 1.0})) for action in
+                               [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP])
 
     def __init__(self, index, allPaths):
         self.index = index
@@ -109,41 +112,30 @@ class ForkTruckPath(GhostAgent):
         self.end = self.paths[0][len(self.paths[0]) - 1]
         self.goToEnd = False
 
-    def getDistribution(self, state):
-        dist = util.Counter()
+        # At the start the truck picks a path to the end, at the end one back
+        self.turns = {self.end: False, self.start: True}
+        # nextDistributions[path][goToEnd] maps a position on the path to the
+        # distribution of the move to the next position in that direction
+        self.nextDistributions = [(self.getNextDistributions(path[::-1]), self.getNextDistributions(path))
+                                  for path in self.paths]
+
+    def getNextDistributions(self, path):
+        "Maps every position of the path to the distribution of the move to its successor."
+        nextDistributions = {}
+        for (x_cur, y_cur), (x_next, y_next) in zip(path, path[1:]):
+            action = Actions.vectorToDirection((x_next - x_cur, y_next - y_cur))
+            nextDistributions[(x_cur, y_cur)] = self.actionDistributions[action]
+        return nextDistributions
 
+    def getDistribution(self, state):
         x, y = state.getGhostState(self.index).configuration.pos
         forkTruckPosition = (int(x), int(y))
 
-        if forkTruckPosition == self.start:
+        goToEnd = self.turns.get(forkTruckPosition)
+        if goToEnd is not None:
             self.currentPathIndex = util.chooseFromDistribution(self.probability[len(self.paths)])
-            self.goToEnd = True
-
-        if forkTruckPosition == self.end:
-            self.currentPathIndex = util.chooseFromDistribution(self.probability[len(self.paths)])
-            self.goToEnd = False
-
-        currentPath = self.paths[self.currentPathIndex]
-        currentIndex = currentPath.index(forkTruckPosition)
+            self.goToEnd = goToEnd
 
-        if self.goToEnd:
-            nextPosition = currentPath[currentIndex + 1]
-        else:
-            nextPosition = currentPath[currentIndex - 1]
-
-        x_cur, y_cur = forkTruckPosition
-        x_next, y_next = nextPosition
-
-        if x_next < x_cur:
-            dist[Directions.WEST] = 1.0
-        elif x_next > x_cur:
-            dist[Directions.EAST] = 1.0
-        elif y_next < y_cur:
-            dist[Directions.SOUTH] = 1.0
-        elif y_next > y_cur:
-            dist[Directions.NORTH] = 1.0
-        else:
-            dist[Directions.STOP] = 1.0
-
-        dist.normalize()
-        return dist
+        # A path of a single position has no move
+        return self.nextDistributions[self.currentPathIndex][self.goToEnd].get(
+            forkTruckPosition, self.actionDistributions[Directions.STOP])
@@ -0,0 +1,100 @@
+# experienceReplay.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+experienceReplay.py stores featurized transitions of an ApproximateQAgent
+so that they can be learned from more than once.
+
+A transition is kept as the feature vector of the action taken, the
+feature vectors of every legal action in the next state, the reward and
+whether the next state ended the game.  All of it lives in preallocated
+NumPy arrays used as a ring buffer, so a minibatch of TD updates is a
+handful of array operations.
+"""
+
+import random
+
+import numpy as np
+
+
+class ReplayBuffer:
+    """
+    A ring buffer of the last capacity transitions.  Feature vectors grow
+    with the agent's FeatureIndex, so the arrays widen (with zeros) when a
+    longer vector is added.  Minibatches are drawn with a random generator
+    of the buffer, so replay does not change the games of a seeded run.
+    """
+
+    def __init__(self, capacity, maxActions=5, seed=0):
+        self.capacity = capacity
+        self.maxActions = maxActions
+        self.width = 0
+        self.size = 0
+        self.next = 0
+        self.features = np.zeros((capacity, 0))
+        self.nextFeatures = np.zeros((capacity, maxActions, 0))
+        self.nextLegal = np.zeros((capacity, maxActions), dtype=bool)
+        self.rewards = np.zeros(capacity)
+        self.terminal = np.zeros(capacity, dtype=bool)
+        self.random = random.Random(seed)
+
+    def __len__(self):
+        return self.size
+
+    def widen(self, width):
+        if width <= self.width:
+            return
+        extra = width - self.width
+        self.features = np.concatenate([self.features, np.zeros((self.capacity, extra))], axis=1)
+        self.nextFeatures = np.concatenate([self.nextFeatures, np.zeros((self.capacity, self.maxActions, extra))], axis=2)
+        self.width = width
+
+    def add(self, features, nextFeatures, reward, terminal):
+        """
+        Stores a transition.  features is the vector of the action taken,
+        nextFeatures holds one vector per legal action of the next state.
+        """
+        self.widen(max([len(features)] + [len(vector) for vector in nextFeatures]))
+        i = self.next
+        self.features[i] = 0
+        self.features[i, :len(features)] = features
+        self.nextFeatures[i] = 0
+        self.nextLegal[i] = False
+        for a, vector in enumerate(nextFeatures[:self.maxActions]):
+            self.nextFeatures[i, a, :len(vector)] = vector
+            self.nextLegal[i, a] = True
+        self.rewards[i] = reward
+        self.terminal[i] = terminal
+        self.next = (self.next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batchSize):
+        "Returns the indices of batchSize different stored transitions."
+        return np.array(self.random.sample(range(self.size), min(batchSize, self.size)))
+
+    def update(self, weights, alpha, discount, batchSize):
+        """
+        Does one TD update of weights (in place) with the average over a
+        random minibatch, the same rule as ApproximateQAgent.update.
+        """
+        batch = self.sample(batchSize)
+        w = weights[:self.width]
+        features = self.features[batch]
+        nextQValues = self.nextFeatures[batch].dot(w)
+        nextQValues[~self.nextLegal[batch]] = -np.inf
+        nextValues = nextQValues.max(axis=1)
+        # Like computeValueFromQValues, states without legal actions are worth 0
+        nextValues[self.terminal[batch] | ~self.nextLegal[batch].any(axis=1)] = 0.0
+        differences = self.rewards[batch] + discount * nextValues - features.dot(w)
+        w += alpha * differences.dot(features) / len(batch)
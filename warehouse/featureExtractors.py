@@ -14,8 +14,108 @@
 
 "Feature extractors for Pacman game states"
 
+import collections
+import heapq
+
+import numpy as np
+
 import util
 from game import Actions
+from game import Directions
+from game import NeighborhoodIndex
+
+
+class PackedStateEncoder:
+    """
+    Maps a GameState to a single integer, for tabular agents on small
+    warehouses.  Only the chosen parts of the state are encoded:
+
+      pacman   - the cell of the forklift
+      ghosts   - cell and direction of every other truck
+      packages - which of the packages of the first state are left
+      loaded   - whether the forklift carries a package
+
+    Each part is a digit of a mixed radix number, so different states give
+    different codes as long as they agree on the parts left out.  size is
+    the number of codes.
+    """
+    PARTS = ['pacman', 'ghosts', 'packages', 'loaded']
+    DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+
+    def __init__(self, state, parts=PARTS):
+        for part in parts:
+            if part not in self.PARTS:
+                raise Exception('Unknown state part: ' + part)
+        self.parts = list(parts)
+        # Package cells are walls for the trucks, so cells are counted on the
+        # walls of the layout itself
+        walls = state.data.layout.walls
+        self.cells = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y]:
+                    self.cells[(x, y)] = len(self.cells)
+        self.directions = dict((direction, i) for i, direction in enumerate(self.DIRECTIONS))
+        self.packageCells = state.getPackages().asList()
+        self.numGhosts = state.getNumAgents() - 1
+
+        radices = {'pacman': [len(self.cells)],
+                   'ghosts': [len(self.cells), len(self.DIRECTIONS)] * self.numGhosts,
+                   'packages': [2] * len(self.packageCells),
+                   'loaded': [2]}
+        self.size = 1
+        for part in self.parts:
+            for radix in radices[part]:
+                self.size *= radix
+
+    def encode(self, state):
+        numCells, code = len(self.cells), 0
+        for part in self.parts:
+            if part == 'pacman':
+                code = code * numCells + self.cells[util.nearestPoint(state.getPacmanPosition())]
+            elif part == 'ghosts':
+                for ghost in state.getGhostStates():
+                    code = code * numCells + self.cells[util.nearestPoint(ghost.getPosition())]
+                    code = code * len(self.DIRECTIONS) + self.directions[ghost.getDirection()]
+            elif part == 'packages':
+                packages = state.getPackages()
+                for x, y in self.packageCells:
+                    code = 2 * code + packages[x][y]
+            elif part == 'loaded':
+                code = 2 * code + state.getLoadingInfo()
+        return code
+
+
+class FeatureIndex:
+    """
+    Gives every feature name a fixed position in a dense feature vector.  A
+    name gets the next free position the first time an extractor produces
+    it, so vectors made earlier may be shorter than later ones.
+    """
+    def __init__(self, names=()):
+        self.indices = {}
+        self.names = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name):
+        "Returns the position of name, giving it the next free one if it is new."
+        if name not in self.indices:
+            self.indices[name] = len(self.names)
+            self.names.append(name)
+        return self.indices[name]
+
+    def vectorize(self, features):
+        "Returns the Counter of features as a NumPy vector."
+        for name in features:
+            self.add(name)
+        vector = np.zeros(len(self.names))
+        for name, value in features.items():
+            vector[self.indices[name]] = value
+        return vector
 
 
 class FeatureExtractor:
@@ -93,6 +193,201 @@ def distExit(pos, exit, walls):
     return None
 
 
+class DistanceField:
+    """
+    The maze distance from every cell to the closest of the given source
+    cells, computed with one search started from all sources at once.
+    getDistance(pos) returns what a search from pos over the same walls
+    (like distExit) returns.
+    """
+
+    def __init__(self, sources, walls):
+        # The walls of a layout change while playing, so keep our own copy
+        self.walls = walls.copy()
+        self.distances = [[None] * walls.height for x in range(walls.width)]
+        fringe = []
+        for x, y in sources:
+            self.distances[x][y] = 0
+            fringe.append((0, x, y))
+        self._spread(fringe)
+
+    def _spread(self, fringe):
+        "Lowers the distances reachable from the (dist, x, y) entries of fringe."
+        distances, walls = self.distances, self.walls
+        heapq.heapify(fringe)
+        while fringe:
+            dist, x, y = heapq.heappop(fringe)
+            if dist > distances[x][y]:
+                continue
+            for nbr_x, nbr_y in Actions.getLegalNeighbors((x, y), walls):
+                nbrDist = distances[nbr_x][nbr_y]
+                if nbrDist is None or nbrDist > dist + 1:
+                    distances[nbr_x][nbr_y] = dist + 1
+                    heapq.heappush(fringe, (dist + 1, nbr_x, nbr_y))
+
+    def copy(self):
+        field = DistanceField.__new__(DistanceField)
+        field.walls = self.walls.copy()
+        field.distances = [column[:] for column in self.distances]
+        return field
+
+    def removeCells(self, cells):
+        """
+        Updates the field after the given cells stopped being sources or
+        became walls (a loaded package is both).  Only the cells whose
+        shortest path led to or through one of them are searched again,
+        starting from the distances of the cells around them.
+        """
+        distances, walls = self.distances, self.walls
+        region = set()
+        fringe = collections.deque()
+        for x, y in cells:
+            if distances[x][y] is not None and (x, y) not in region:
+                region.add((x, y))
+                fringe.append((x, y))
+        while fringe:
+            x, y = fringe.popleft()
+            for nbr in Actions.getLegalNeighbors((x, y), walls):
+                if nbr not in region and distances[nbr[0]][nbr[1]] == distances[x][y] + 1:
+                    region.add(nbr)
+                    fringe.append(nbr)
+        for x, y in region:
+            distances[x][y] = None
+        border = []
+        for x, y in region:
+            if walls[x][y]:
+                continue
+            nbrDists = [distances[nbr_x][nbr_y] for nbr_x, nbr_y in Actions.getLegalNeighbors((x, y), walls)]
+            nbrDists = [dist for dist in nbrDists if dist is not None]
+            if nbrDists:
+                distances[x][y] = min(nbrDists) + 1
+                border.append((distances[x][y], x, y))
+        self._spread(border)
+
+    def getDistance(self, pos):
+        x, y = pos
+        if not self.walls[x][y] or self.distances[x][y] == 0:
+            return self.distances[x][y]
+        # A search started inside a wall still steps out to the free neighbours
+        nbrDists = [self.distances[nbr_x][nbr_y] for nbr_x, nbr_y in Actions.getLegalNeighbors(pos, self.walls)]
+        nbrDists = [dist for dist in nbrDists if dist is not None]
+        if not nbrDists:
+            return None
+        return min(nbrDists) + 1
+
+
+class WallsKey:
+    """
+    Turns wall grids into keys for the caches.  The key of the last grid is
+    reused as long as the same Grid is passed (the agent only sees copies of
+    the game state, which are not changed), and for a new Grid as long as
+    its walls are the same, so a new key is only built when the walls change.
+    Works the same way for the package grids.
+    """
+
+    def __init__(self):
+        self.lastWalls = None
+        self.lastData = None
+        self.lastKey = None
+
+    def getKey(self, walls):
+        if walls is not self.lastWalls:
+            if walls.data != self.lastData:
+                self.lastKey = tuple(map(tuple, walls.data))
+                self.lastData = [column[:] for column in walls.data]
+            self.lastWalls = walls
+        return self.lastKey
+
+
+class DistanceFieldCache:
+    """
+    Keeps the DistanceFields of the last few (walls, sources) combinations.
+    Loaded packages turn into walls, so the walls are part of the key.
+    """
+
+    def __init__(self, size=32):
+        self.size = size
+        self.fields = collections.OrderedDict()
+        self.wallsKey = WallsKey()
+
+    def getField(self, sources, walls):
+        key = (self.wallsKey.getKey(walls), tuple(sources))
+        field = self.fields.get(key)
+        if field is None:
+            field = DistanceField(sources, walls)
+            self.fields[key] = field
+            if len(self.fields) > self.size:
+                self.fields.popitem(last=False)
+        else:
+            self.fields.move_to_end(key)
+        return field
+
+
+def changedCells(old, new):
+    "Returns the cells in which two grids given as tuples of columns differ."
+    cells = []
+    for x, (oldColumn, newColumn) in enumerate(zip(old, new)):
+        if oldColumn != newColumn:
+            cells += [(x, y) for y, (a, b) in enumerate(zip(oldColumn, newColumn)) if a != b]
+    return cells
+
+
+class PackageDistanceCache:
+    """
+    Keeps the distance fields to the closest package of the last few
+    (walls, packages) combinations.  The agent sees a fresh copy of the
+    state every move, so fields are looked up by content.  Within a game
+    packages only disappear and walls only appear, so a missing field is
+    derived from the last one used by searching again around the cells
+    that changed.
+    """
+
+    def __init__(self, size=32, maxChanges=4):
+        self.size = size
+        self.maxChanges = maxChanges
+        self.fields = collections.OrderedDict()
+        self.wallsKey = WallsKey()
+        self.packagesKey = WallsKey()
+        self.lastKey = None
+        self.lastPackages = None
+        self.lastWalls = None
+
+    def getField(self, packages, walls):
+        # Most lookups are for the same state, once per legal action
+        if packages is self.lastPackages and walls is self.lastWalls:
+            return self.fields[self.lastKey]
+        key = (self.wallsKey.getKey(walls), self.packagesKey.getKey(packages))
+        field = self.fields.get(key)
+        if field is None:
+            field = self._deriveField(key) or DistanceField(packages.asList(), walls)
+            self.fields[key] = field
+            if len(self.fields) > self.size:
+                self.fields.popitem(last=False)
+        else:
+            self.fields.move_to_end(key)
+        self.lastKey = key
+        self.lastPackages = packages
+        self.lastWalls = walls
+        return field
+
+    def _deriveField(self, key):
+        if self.lastKey not in self.fields:
+            return None
+        lastWalls, lastPackages = self.lastKey
+        walls, packages = key
+        newWalls = changedCells(lastWalls, walls)
+        removedPackages = changedCells(lastPackages, packages)
+        if len(newWalls) + len(removedPackages) > self.maxChanges:
+            return None
+        if any(not walls[x][y] for x, y in newWalls) or any(packages[x][y] for x, y in removedPackages):
+            return None
+        field = self.fields[self.lastKey].copy()
+        for x, y in newWalls:
+            field.walls[x][y] = True
+        field.removeCells(newWalls + removedPackages)
+        return field
+
+
 class SimpleExtractor(FeatureExtractor):
     """
     Returns simple features for a basic reflex Pacman:
@@ -101,6 +396,27 @@ class SimpleExtractor(FeatureExtractor):
     - whether a ghost collision is imminent
     - whether a ghost is one step away
     """
+    # ghosts this many steps away count as close
+    GHOST_RADIUS = 3
+
+    def __init__(self):
+        self.exitDistances = DistanceFieldCache()
+        self.packageDistances = PackageDistanceCache()
+        self.neighborhoods = collections.OrderedDict()
+        self.neighborhoodWallsKey = WallsKey()
+
+    def getNeighborhoodIndex(self, walls, size=8):
+        "Returns the NeighborhoodIndex of the walls, kept for the last few wall grids."
+        key = self.neighborhoodWallsKey.getKey(walls)
+        index = self.neighborhoods.get(key)
+        if index is None:
+            index = NeighborhoodIndex(walls, self.GHOST_RADIUS)
+            self.neighborhoods[key] = index
+            if len(self.neighborhoods) > size:
+                self.neighborhoods.popitem(last=False)
+        else:
+            self.neighborhoods.move_to_end(key)
+        return index
 
     def getFeatures(self, state, action):
         # extract the grid of packages and wall locations and get the ghost locations
@@ -120,10 +436,7 @@ class SimpleExtractor(FeatureExtractor):
         next_x, next_y = int(x + dx), int(y + dy)
 
         # count the number of ghosts 1,2 and 3-steps away
-        sum_ghosts_close=0
-        for g in ghosts:
-            if g in Actions.getLegalClosestNeighbors((x,y), walls):
-                sum_ghosts_close=sum_ghosts_close+1
+        sum_ghosts_close = self.getNeighborhoodIndex(walls).countWithin((x, y), ghosts)
 
         # count the number of ghosts 1-step away
         features["#-of-ghosts-1-step-away"] = sum(
@@ -138,7 +451,7 @@ class SimpleExtractor(FeatureExtractor):
             if not features["#-of-ghosts-1-step-away"] and next_x == exit_x and next_y == exit_y:
                 features["goto-exit"] = 1.0
 
-            dist_exit = distExit((next_x, next_y), (exit_x, exit_y), walls)
+            dist_exit = self.exitDistances.getField([(exit_x, exit_y)], walls).getDistance((next_x, next_y))
             assert (dist_exit != None)
             # make the distance a number less than one otherwise the update
             # will diverge wildly
@@ -149,14 +462,12 @@ class SimpleExtractor(FeatureExtractor):
             # if there is no danger of ghosts then add the packages feature
             #if not features["#-of-ghosts-1-step-away"] and packages[next_x][next_y]:
 
-            if packages[next_x][next_y]:
-                if sum_ghosts_close == 0:
-                    features["eats-packages"] = 1.0
-                    dist_package = closestPackages((next_x, next_y), packages, walls, False)
-                else:
-                    dist_package = closestPackages((next_x, next_y), packages, walls, True)
+            if packages[next_x][next_y] and sum_ghosts_close != 0:
+                dist_package = closestPackages((next_x, next_y), packages, walls, True)
             else:
-                dist_package = closestPackages((next_x, next_y), packages, walls, False)
+                if packages[next_x][next_y]:
+                    features["eats-packages"] = 1.0
+                dist_package = self.packageDistances.getField(packages, walls).getDistance((next_x, next_y))
 
             if dist_package is not None:
                 # make the distance a number less than one otherwise the update
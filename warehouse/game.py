@@ -469,6 +469,45 @@ class Actions:
     getSuccessor = staticmethod(getSuccessor)
 
 
+class NeighborhoodIndex:
+    """
+    Holds, for every cell, the set of cells that are at most k steps away on
+    the given walls.  For k = 3 these are the cells that
+    Actions.getLegalClosestNeighbors returns, but they are searched once
+    per wall grid instead of on every call.
+    """
+
+    def __init__(self, walls, k):
+        self.k = k
+        self.walls = walls.copy()
+        self.neighborhoods = {}
+        for x in range(walls.width):
+            for y in range(walls.height):
+                self.neighborhoods[(x, y)] = self._search((x, y))
+
+    def _search(self, position):
+        x, y = position
+        cells = set() if self.walls[x][y] else set([position])
+        fringe = [position]
+        for step in range(self.k):
+            nextFringe = []
+            for cell in fringe:
+                for nbr in Actions.getLegalNeighbors(cell, self.walls):
+                    if nbr not in cells:
+                        cells.add(nbr)
+                        nextFringe.append(nbr)
+            fringe = nextFringe
+        return frozenset(cells)
+
+    def getNeighborhood(self, position):
+        return self.neighborhoods[(int(position[0]), int(position[1]))]
+
+    def countWithin(self, position, positions):
+        "Returns how many of positions (e.g. the ghosts) are at most k steps away."
+        neighborhood = self.getNeighborhood(position)
+        return sum(1 for pos in positions if pos in neighborhood)
+
+
 class GameStateData:
     """
 
@@ -484,9 +523,12 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
-            self.colorFields = prevState.colorFields
+            self.showColorFields = prevState.showColorFields
+        else:
+            self.showColorFields = False
 
-        self.colorFields = list()
+        # Colour fields by coordinate, only kept if a display shows them
+        self.colorFields = dict()
         self._package_eaten = None
         self._package_added = None
         self._agentMoved = None
@@ -507,19 +549,20 @@ class GameStateData:
         return state
 
     def addColorField(self, x, y, color):
-        field = dict()
-        field['color'] = color
-        field['coordinate'] = (x, y)
-        self.colorFields.append(field)
+        if self.showColorFields:
+            self.colorFields[(x, y)] = color
 
     def removeColorField(self, x, y):
-        for f in self.colorFields:
-            if f['coordinate'] == (x, y):
-                self.colorFields.remove(f)
-                break
+        self.colorFields.pop((x, y), None)
 
     def removeAllColorFields(self):
-        self.colorFields = list()
+        self.colorFields = dict()
+
+    def getColorFields(self):
+        """
+        Returns the colour fields in the order they were added.
+        """
+        return [{'color': color, 'coordinate': coordinate} for coordinate, color in self.colorFields.items()]
 
     def cutFrame(self, x, y, r):
 
@@ -770,6 +813,9 @@ class Game:
         """
         Main control loop for game play.
         """
+        # Colour fields are only kept up to date for a graphical display
+        if "checkNullDisplay" in dir(self.display):
+            self.state.data.showColorFields = not self.display.checkNullDisplay()
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -812,6 +858,7 @@ class Game:
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
+        updateDisplay = timed('display.update')(self.display.update)
 
         while not self.gameOver:
             # Fetch the next agent
@@ -907,17 +954,11 @@ class Game:
             else:
                 self.state = self.state.generateSuccessor(agentIndex, action)
 
-            for c in observation.data.colorFields:
-                ok = True
-                for cs in self.state.data.colorFields:
-                    if cs['coordinate'] == c['coordinate']:
-                        ok = False
-                        break
-                if ok:
-                    self.state.data.colorFields.append(c)
+            for coordinate, color in observation.data.colorFields.items():
+                self.state.data.colorFields.setdefault(coordinate, color)
 
             # Change the display
-            self.display.update(self.state.data)
+            updateDisplay(self.state.data)
 
             # Allow for game specific conditions (winning, losing, etc.)
             self.rules.process(self.state, self)
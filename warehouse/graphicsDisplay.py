@@ -140,6 +140,9 @@ class PacmanGraphics:
         self.capture = capture
         self.frameTime = frameTime
 
+    def checkNullDisplay(self):
+        return False
+
     def initialize(self, state, isBlue=False):
         self.isBlue = isBlue
         self.startGraphics(state)
@@ -180,7 +183,7 @@ class PacmanGraphics:
             x, y = self.to_screen(pos)
             self.drawExit(x, y)
         # set all background to black
-        self.background = self.drawBackground(state.colorFields)
+        self.background = self.drawBackground(state.getColorFields())
         self.packages = self.drawAllPackages(layout.packages)
         refresh()
 
@@ -220,7 +223,7 @@ class PacmanGraphics:
             remove_from_screen(f)
 
         # draw colorFields
-        self.background = self.drawBackground(newState.colorFields)
+        self.background = self.drawBackground(newState.getColorFields())
 
         if self.agentImages[agentIndex][0].isPacman != agentState.isPacman:
             self.swapImages(agentIndex, agentState)
@@ -12,6 +12,7 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import heapq
 import os
 import random
 from functools import reduce
@@ -21,6 +22,7 @@ from util import manhattanDistance
 
 
 VISIBILITY_MATRIX_CACHE = {}
+PATHS_CACHE = {}
 
 
 class Layout:
@@ -149,77 +151,85 @@ class Layout:
         elif layoutChar in ['a', 'b', 'c', 'd']:
             self.endPointPositions.append((int(['a', 'b', 'c', 'd'].index(layoutChar) + 1), (x, y)))
 
-    def getPaths(self):
+    def getPaths(self, numPaths=5):
+        """
+        Computes the numPaths shortest paths of every fork truck from its start
+        to its endpoint (ForkTruckPath keeps the five shortest).  The paths
+        only depend on the layout, so they are cached by its text.
+        """
         if len(self.endPointPositions) != self.numGhosts:
             raise Exception('Every Ghost needs an Endpoint')
 
-        for i in range(self.numGhosts):
-            offset = len(self.agentPositions) - len(self.endPointPositions)
-            _, pos_start = self.agentPositions[i + offset]
-            _, pos_end = self.endPointPositions[i]
-            x_start, y_start = pos_start
-            x_end, y_end = pos_end
-
-            if x_start < x_end:
-                x_left = x_start
-                x_right = x_end
-            else:
-                x_left = x_end
-                x_right = x_start
-
-            if y_start < y_end:
-                y_bottom = y_start
-                y_top = y_end
-            else:
-                y_bottom = y_end
-                y_top = y_start
-
-            all_paths = []
-            self.calculatePath(all_paths, x_start, y_start, [], pos_end, (x_left, x_right, y_top, y_bottom))
-            self.paths.append(all_paths)
-
-    def calculatePath(self, all_paths, x, y, path, end, boundaries):
-        path.append((x, y))
-        if end == (x, y):
-            all_paths.append(path)
-            return
-
+        key = (reduce(str.__add__, self.layoutText), numPaths)
+        if key not in PATHS_CACHE:
+            allPaths = []
+            for i in range(self.numGhosts):
+                offset = len(self.agentPositions) - len(self.endPointPositions)
+                _, pos_start = self.agentPositions[i + offset]
+                _, pos_end = self.endPointPositions[i]
+                x_start, y_start = pos_start
+                x_end, y_end = pos_end
+                boundaries = (min(x_start, x_end), max(x_start, x_end), max(y_start, y_end), min(y_start, y_end))
+                allPaths.append(self.calculatePaths(pos_start, pos_end, boundaries, numPaths))
+            PATHS_CACHE[key] = allPaths
+        self.paths = [list(paths) for paths in PATHS_CACHE[key]]
+
+    def calculatePaths(self, start, end, boundaries, numPaths):
+        """
+        Returns the numPaths shortest paths from start to end within the
+        boundaries (left, right, top, bottom).  Paths of equal length are in
+        the order a depth first search trying north, east, south and west
+        finds them.  Partial paths are expanded best first by their length
+        plus the manhattan distance left, so the search stops as soon as the
+        last path is found instead of enumerating every path.
+        """
+        paths = []
+        fringe = [(1 + manhattanDistance(start, end), (), (start,))]
+        while len(fringe) > 0 and len(paths) < numPaths:
+            _, turns, path = heapq.heappop(fringe)
+            if path[-1] == end:
+                paths.append(list(path))
+                continue
+            for turn, cell in enumerate(self.getPathSuccessors(path, boundaries)):
+                heapq.heappush(fringe, (len(path) + 1 + manhattanDistance(cell, end), turns + (turn,), path + (cell,)))
+        return paths
+
+    def getPathSuccessors(self, path, boundaries):
+        """
+        Returns the cells in which a fork truck path can continue, north, east,
+        south and west.  At a crossing the truck does not turn into a side
+        aisle, which it can also reach diagonally, so it keeps its axis.
+        """
+        x, y = path[-1]
+        visited = set(path)
         left, right, top, bottom = boundaries
-        l, r, t, b = False, False, False, False
-        count = 0
-
-        if y < self.height and y < top + 1 and not self.wallsGhost[x][y + 1]:
-            count += 1
-            t = True
-        if x < self.width and x < right + 1 and not self.wallsGhost[x + 1][y]:
-            count += 1
-            r = True
-        if y > 0 and y > bottom - 1 and not self.wallsGhost[x][y - 1]:
-            count += 1
-            b = True
-        if x > 0 and x > left - 1 and not self.wallsGhost[x - 1][y]:
-            count += 1
-            l = True
-
-        if count >= 3 and ((t and path.count((x, y + 1)) == 1) or (b and path.count((x, y - 1)) == 1) or len(path) == 1):
+        t = y < self.height and y < top + 1 and not self.wallsGhost[x][y + 1]
+        r = x < self.width and x < right + 1 and not self.wallsGhost[x + 1][y]
+        b = y > 0 and y > bottom - 1 and not self.wallsGhost[x][y - 1]
+        l = x > 0 and x > left - 1 and not self.wallsGhost[x - 1][y]
+        count = t + r + b + l
+
+        if count >= 3 and ((t and (x, y + 1) in visited) or (b and (x, y - 1) in visited) or len(path) == 1):
             if t and b and l and not self.wallsGhost[x - 1][y + 1] and not self.wallsGhost[x - 1][y - 1]:
                 l = False
             if t and b and r and not self.wallsGhost[x + 1][y + 1] and not self.wallsGhost[x + 1][y - 1]:
                 r = False
-        elif count >= 3 and ((l and path.count((x - 1, y)) == 1) or (r and path.count((x + 1, y)) == 1) or len(path) == 1):
+        elif count >= 3 and ((l and (x - 1, y) in visited) or (r and (x + 1, y) in visited) or len(path) == 1):
             if l and r and t and not self.wallsGhost[x - 1][y + 1] and not self.wallsGhost[x + 1][y + 1]:
                 t = False
             if l and r and b and not self.wallsGhost[x - 1][y - 1] and not self.wallsGhost[x + 1][y - 1]:
                 b = False
 
-        if t and y < top and not self.walls[x][y + 1] and path.count((x, y + 1)) == 0:
-            self.calculatePath(all_paths, x, y + 1, path.copy(), end, boundaries)
-        if r and x < right and not self.walls[x + 1][y] and path.count((x + 1, y)) == 0:
-            self.calculatePath(all_paths, x + 1, y, path.copy(), end, boundaries)
-        if b and y > bottom and not self.walls[x][y - 1] and path.count((x, y - 1)) == 0:
-            self.calculatePath(all_paths, x, y - 1, path.copy(), end, boundaries)
-        if l and x > left and not self.walls[x - 1][y] and path.count((x - 1, y)) == 0:
-            self.calculatePath(all_paths, x - 1, y, path.copy(), end, boundaries)
+        successors = []
+        if t and y < top and not self.walls[x][y + 1] and (x, y + 1) not in visited:
+            successors.append((x, y + 1))
+        if r and x < right and not self.walls[x + 1][y] and (x + 1, y) not in visited:
+            successors.append((x + 1, y))
+        if b and y > bottom and not self.walls[x][y - 1] and (x, y - 1) not in visited:
+            successors.append((x, y - 1))
+        if l and x > left and not self.walls[x - 1][y] and (x - 1, y) not in visited:
+            successors.append((x - 1, y))
+        return successors
 
 
 def getLayout(name, back=2):
@@ -0,0 +1,362 @@
+# localizedShield.py
+# ------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+localizedShield.py decides which actions of pacman (the forklift in the
+warehouse) are safe by looking a few steps ahead on the part of the
+layout pacman can see, instead of querying a shield computed for the
+whole layout beforehand.
+
+Pacman sees the cells it can reach within horizon steps.  A ghost (fork
+truck) seen there may move to any visible neighbour cell each step, and
+an action is safe if pacman can stay out of the cells the ghosts may be
+in for the next lookAhead steps.
+
+pacman/ and warehouse/ use the same engine: the two copies of this file
+are identical and must be kept that way.
+"""
+
+import logging
+
+import numpy as np
+
+# Cells of a visibility map, CELL_CHARS[cell] prints one
+CELL_UNSEEN = -1
+CELL_FREE = 0
+CELL_GHOST = 1
+CELL_PACMAN = 2
+CELL_CHARS = np.array(['.', 'G', 'P', '?'])
+
+# Actions in the order safe actions are listed, with the (row, column)
+# offset of the cell they lead to.  All but Stop move to a neighbour cell.
+ACTIONS = ["North", "West", "East", "South", "Stop"]
+ACTION_SHIFTS = {"North": (-1, 0), "West": (0, -1), "East": (0, 1), "South": (1, 0), "Stop": (0, 0)}
+MOVES = ACTIONS[:4]
+
+# Distance of the cells that cannot be reached
+UNREACHABLE = 2**31
+
+logger = logging.getLogger(__name__)
+
+
+class LocalizedShield:
+    """
+    The look-ahead shield.  What only depends on the walls is kept per wall
+    grid in WallTables, for when the walls are the same again.
+    """
+
+    def __init__(self, incremental=True, check=False):
+        """
+        incremental - work on the window seen from pacman's cell and reuse
+                      the windows and last answer of earlier steps (see
+                      incrementalSafeActions)
+        check       - also compute every answer from the whole layout and
+                      raise an exception if the two differ
+        """
+        self.incremental = incremental
+        self.check = check
+        self.walls = None
+        self.tables = {}
+        self.last = None
+
+    def setWalls(self, walls):
+        "Switches to the WallTables of a wall grid, making them if needed."
+        if self.walls is not None and self.walls == walls:
+            return
+        self.walls = walls.copy()
+        if self.walls not in self.tables:
+            self.tables[self.walls] = WallTables(walls)
+        self.wallTables = self.tables[self.walls]
+
+    def getRowCol(self, position):
+        "Returns the (row, column) of a game position, row 0 at the top."
+        return self.wallTables.shape[0] - int(position[1]) - 1, int(position[0])
+
+    def getCell(self, position):
+        "Returns the flat index of the cell of a game position."
+        row, col = self.getRowCol(position)
+        return row * self.wallTables.shape[1] + col
+
+    def visibilityMap(self, state, horizon):
+        """
+        Returns the cells pacman can reach within horizon steps as an int
+        array (row 0 is the top of the layout) of CELL_FREE, CELL_GHOST and
+        CELL_PACMAN.  All other cells, walls included, are CELL_UNSEEN.
+        """
+        self.setWalls(state.getWalls())
+        pacman = self.getCell(state.getPacmanPosition())
+        visibility = np.where(self.wallTables.getDistances(pacman) <= horizon, CELL_FREE, CELL_UNSEEN)
+        for ghost in state.getGhostPositions():
+            cell = self.getCell(ghost)
+            if visibility[cell] != CELL_UNSEEN:
+                visibility[cell] = CELL_GHOST
+        visibility[pacman] = CELL_PACMAN
+        return visibility.reshape(self.wallTables.shape)
+
+    def getWindow(self, pacman, horizon):
+        """
+        Returns the LookAheadWindow seen from (row, column) pacman, kept per
+        cell, horizon and wall grid.
+        """
+        if (pacman, horizon) not in self.wallTables.windows:
+            self.wallTables.windows[(pacman, horizon)] = LookAheadWindow(self.wallTables.openCells, pacman, horizon)
+        return self.wallTables.windows[(pacman, horizon)]
+
+    def safeActions(self, state, lookAhead, horizon, legalActions=None):
+        """
+        Returns the legal actions of pacman that are safe for lookAhead
+        steps, and the safety margin of every legal action: how many steps
+        pacman can stay away from the ghosts it sees after taking it, with
+        lookAhead+1 for a safe action.  Without a look ahead every legal
+        action is safe.
+        """
+        if legalActions is None:
+            legalActions = state.getLegalPacmanActions()
+        if lookAhead <= 0:
+            return list(legalActions), dict((action, lookAhead+1) for action in legalActions)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Vis Map\n%s\n%s", state.getPacmanPosition(),
+                         "\n".join("".join(line) for line in CELL_CHARS[self.visibilityMap(state, horizon)]))
+
+        if not self.incremental:
+            return self.fullSafeActions(state, lookAhead, horizon, legalActions)
+        safe, margins = self.incrementalSafeActions(state, lookAhead, horizon, legalActions)
+        if self.check:
+            full = self.fullSafeActions(state, lookAhead, horizon, legalActions)
+            if full != (safe, margins):
+                raise Exception('Incremental look ahead gave %s %s instead of %s %s for\n%s' % (safe, margins, full[0], full[1], state))
+        return safe, margins
+
+    def fullSafeActions(self, state, lookAhead, horizon, legalActions):
+        "Computes safeActions from the visibility map of the whole layout."
+        visibility = self.visibilityMap(state, horizon)
+        pacman = self.getCell(state.getPacmanPosition())
+        shifts = self.wallTables.getShifts()
+
+        # The visible cells are numbered; targets[a] holds the number of the
+        # cell action ACTIONS[a] leads to from every visible cell, or n if
+        # it is not visible
+        cells = np.flatnonzero(visibility != CELL_UNSEEN)
+        n = len(cells)
+        numbers = np.full(self.wallTables.size+1, n)
+        numbers[cells] = np.arange(n)
+        targets = numbers[shifts[:, cells]]
+
+        ghost_maps = self.ghostMaps(targets, visibility.ravel()[cells] == CELL_GHOST, lookAhead)
+        safety = self.safetyMap(targets, ghost_maps, lookAhead)
+        return self.getMargins(safety[numbers[shifts[:, pacman]]], lookAhead, legalActions)
+
+    def incrementalSafeActions(self, state, lookAhead, horizon, legalActions):
+        """
+        Computes safeActions on the window seen from pacman's cell, so the
+        work depends on the horizon and not on the size of the layout.  The
+        window of a cell is kept, and so is the whole answer of the last
+        step for when pacman's cell and the ghost cells it sees did not
+        change.  Without a ghost in sight only the cells out of sight are
+        unsafe.
+        """
+        self.setWalls(state.getWalls())
+        window = self.getWindow(self.getRowCol(state.getPacmanPosition()), horizon)
+        n = window.n
+        # A ghost on pacman's cell is not seen, as in visibilityMap
+        ghosts = set(window.getNumber(self.getRowCol(ghost)) for ghost in state.getGhostPositions())
+        ghosts = tuple(sorted(ghosts - set([n, window.pacman])))
+        key = (window, ghosts, lookAhead, tuple(legalActions))
+        if self.last is not None and self.last[0] == key:
+            return list(self.last[1]), dict(self.last[2])
+
+        if ghosts:
+            ghost_set = np.zeros(n, dtype=bool)
+            ghost_set[list(ghosts)] = True
+            ghost_maps = self.ghostMaps(window.targets, ghost_set, lookAhead)
+            safety = self.safetyMap(window.targets, ghost_maps, lookAhead)
+        else:
+            safety = np.full(n+1, lookAhead+1)
+            safety[n] = 1 if lookAhead > 1 else 2
+        safe, margins = self.getMargins(safety[window.pacmanTargets], lookAhead, legalActions)
+        self.last = (key, safe, margins)
+        return list(safe), dict(margins)
+
+    def ghostMaps(self, targets, ghost_set, lookAhead):
+        """
+        Returns ghost_maps[k] for k up to lookAhead: the visible cells a
+        ghost may be in after k steps, that is the visible neighbours of the
+        cells reachable in fewer steps.  ghost_set holds the ghosts' cells.
+        """
+        n = targets.shape[1]
+        ghost_maps = [ghost_set]
+        reach = np.append(ghost_set, False)
+        for i in range(lookAhead):
+            ghost_set = reach[targets[:len(MOVES)]].any(axis=0)
+            ghost_maps.append(ghost_set)
+            reach[:n] |= ghost_set
+        return ghost_maps
+
+    def safetyMap(self, targets, ghost_maps, lookAhead):
+        """
+        Returns for every visible cell (and n, for the cells out of sight)
+        how many steps pacman can stay away from the ghosts after moving
+        there, lookAhead+1 being safe.
+        """
+        n = targets.shape[1]
+        # pacman_maps[level]: how many steps pacman can stay away from the
+        # ghosts from each cell at this level (lookAhead+1 is safe).  Moves
+        # out of the visible cells count as caught at this level.
+        pacman_maps = np.zeros((lookAhead+1, n+1), dtype=int)
+        pacman_maps[lookAhead, :n] = np.where(ghost_maps[lookAhead], lookAhead, lookAhead+1)
+        pacman_maps[lookAhead, n] = lookAhead+1
+        # Only pacman_maps[1] is used, so level 0 is not computed
+        for level in range(lookAhead-1, 0, -1):
+            pacman_maps[level+1, n] = level
+            pacman_maps[level, :n] = pacman_maps[level+1][targets].max(axis=0)
+            pacman_maps[level, :n][ghost_maps[level]] = level
+            pacman_maps[level, n] = level
+        return pacman_maps[1]
+
+    def getMargins(self, actionSafety, lookAhead, legalActions):
+        """
+        Returns the safe legal actions and the margins of all legal actions,
+        given the safety of the cell every action in ACTIONS leads to.
+        """
+        safe = []
+        margins = {}
+        for a, action in enumerate(ACTIONS):
+            if action in legalActions:
+                margins[action] = int(actionSafety[a])
+                if margins[action] > lookAhead:
+                    safe.append(action)
+                    logger.debug("%s : %s", action, margins[action])
+        return safe, margins
+
+
+class WallTables:
+    """
+    What the shield keeps about one wall grid: its open cells (row 0 is the
+    top of the layout), the windows seen from its cells and, for the
+    computation on the whole layout, the cell every action leads to and the
+    distances from cells.  Cells are numbered by flat index; self.size
+    stands for a cell off the grid.
+    """
+
+    def __init__(self, walls):
+        self.openCells = np.flip(~np.array(walls.data, dtype=bool).T, axis=0)
+        self.shape = self.openCells.shape
+        self.size = self.openCells.size
+        self.windows = {}
+        self.shifts = None
+        self.neighbours = None
+        self.distances = {}
+
+    def getShifts(self):
+        "Returns shifts[a][cell], the cell action ACTIONS[a] leads to from cell."
+        if self.shifts is None:
+            rows, cols = self.shape
+            padded = np.full((rows+2, cols+2), self.size)
+            padded[1:-1, 1:-1] = np.arange(self.size).reshape(self.shape)
+            self.shifts = np.array([padded[1+dRow:rows+1+dRow, 1+dCol:cols+1+dCol].ravel()
+                                    for dRow, dCol in (ACTION_SHIFTS[action] for action in ACTIONS)])
+        return self.shifts
+
+    def getNeighbours(self):
+        """
+        Returns the open neighbours of every cell.  Walls get neighbours
+        too, as the forklift may stand in one (a package it just loaded).
+        In pacman they are never used.
+        """
+        if self.neighbours is None:
+            shifts = self.getShifts()
+            isOpen = np.append(self.openCells.ravel(), False)
+            self.neighbours = [[int(neighbour) for neighbour in shifts[:len(MOVES), cell] if isOpen[neighbour]]
+                               for cell in range(self.size)]
+        return self.neighbours
+
+    def getDistances(self, cell):
+        """
+        Returns the number of steps from cell to every cell, or UNREACHABLE.
+        Kept per cell.
+        """
+        if cell not in self.distances:
+            neighbours = self.getNeighbours()
+            distances = [UNREACHABLE] * self.size
+            distances[cell] = 0
+            frontier = [cell]
+            depth = 0
+            while frontier:
+                depth += 1
+                nextFrontier = []
+                for c in frontier:
+                    for neighbour in neighbours[c]:
+                        if distances[neighbour] == UNREACHABLE:
+                            distances[neighbour] = depth
+                            nextFrontier.append(neighbour)
+                frontier = nextFrontier
+            self.distances[cell] = np.array(distances)
+        return self.distances[cell]
+
+
+class LookAheadWindow:
+    """
+    The cells seen from one cell within a horizon.  They are found on a crop
+    of the layout, horizon rows and columns around the cell and padded with
+    walls, so nothing here depends on the size of the layout.
+
+    The seen cells are numbered 0..n-1, with n standing for the cells out of
+    sight.  targets[a] holds the number of the cell action ACTIONS[a] leads
+    to from every seen cell, pacmanTargets[a] the one it leads to from the
+    cell the window is seen from, which is number pacman.
+    """
+
+    def __init__(self, openCells, pacman, horizon):
+        rows, cols = openCells.shape
+        row, col = pacman
+        top, left = max(0, row-horizon), max(0, col-horizon)
+        bottom, right = min(rows, row+horizon+1), min(cols, col+horizon+1)
+        crop = np.zeros((bottom-top+2, right-left+2), dtype=bool)
+        crop[1:-1, 1:-1] = openCells[top:bottom, left:right]
+        # Layout row and column of crop[0, 0]
+        self.top, self.left = top-1, left-1
+        self.shape = crop.shape
+
+        # The cells within horizon steps, one step at a time.  The padding
+        # is closed, so no step leaves the crop.  Pacman's own cell counts
+        # even when it is a wall (a package the forklift just loaded).
+        seen = np.zeros(crop.shape, dtype=bool)
+        seen[row-self.top, col-self.left] = True
+        for step in range(horizon):
+            grown = seen.copy()
+            grown[1:] |= seen[:-1]
+            grown[:-1] |= seen[1:]
+            grown[:, 1:] |= seen[:, :-1]
+            grown[:, :-1] |= seen[:, 1:]
+            grown &= crop
+            grown[row-self.top, col-self.left] = True
+            if (grown == seen).all():
+                break
+            seen = grown
+
+        cells = np.flatnonzero(seen)
+        self.n = len(cells)
+        self.numbers = np.full(seen.size, self.n)
+        self.numbers[cells] = np.arange(self.n)
+        offsets = np.array([dRow * self.shape[1] + dCol for dRow, dCol in (ACTION_SHIFTS[action] for action in ACTIONS)])
+        self.targets = self.numbers[cells[np.newaxis, :] + offsets[:, np.newaxis]]
+        self.pacman = self.getNumber(pacman)
+        self.pacmanTargets = self.targets[:, self.pacman]
+
+    def getNumber(self, position):
+        "Returns the number of a (row, column) of the layout, n if not seen."
+        row, col = position[0] - self.top, position[1] - self.left
+        if 0 <= row < self.shape[0] and 0 <= col < self.shape[1]:
+            return int(self.numbers[row * self.shape[1] + col])
+        return self.n
@@ -1,5 +1,6 @@
 import stormpy
 import stormpy.core
+import logging
 import os
 import pickle
 import tempfile
@@ -8,9 +9,12 @@ import numpy
 
 from stormEncoder import StormEncoder
 from util import ShortestPath
+from util import timed
 from multiprocessing import Pool
 
 
+logger = logging.getLogger(__name__)
+
 RIGHT = 0
 UP = 1
 LEFT = 2
@@ -61,6 +65,17 @@ def computShieldParallelFunction(params):
                             self.computeShieldEntry(init_pacman, next_dir_pacman, [init_x_ghost, init_y_ghost], ghost_dir, local_copy_of_prismStr, results)
     return results
 
+_loadedShields = {}
+
+def loadShieldFile(filename):
+    """
+    Returns the shield dumped to filename.  A loaded shield is only read, so
+    every file is unpickled once per process (forked processes share it).
+    """
+    if filename not in _loadedShields:
+        _loadedShields[filename] = pickle.load(open(filename, "rb"))
+    return _loadedShields[filename]
+
 class Shield:
 
     def __init__(self, state, symX, symY, distCrossings):
@@ -79,7 +94,7 @@ class Shield:
         self.shield = shield
 
     def loadShield(self, filename):
-        self.shield = pickle.load(open(filename, "rb"))
+        self.shield = loadShieldFile(filename)
 
     def dumpShield(self, dump):
         print("dumping current shield to file: " + dump)
@@ -286,6 +301,7 @@ class Shield:
         assert (res >= 0)
         return res
 
+    @timed('shield')
     def getFromShieldProbabilityToGetEaten(self, init_pacman, next_dir_pacman, init_ghosts, dir_ghosts):
 
         init_pacman, next_dir_pacman, init_ghosts, dir_ghosts = self.getSymmetricArguments(init_pacman, next_dir_pacman,
@@ -293,8 +309,7 @@ class Shield:
         next_pos_pacman = self.encoder.getNextPosition(init_pacman, next_dir_pacman)
 
         if self.encoder.isWall(init_pacman, False):
-            print("Error: init pacman is wall")
-            print(init_pacman)
+            logger.error("Error: init pacman is wall %s", init_pacman)
         assert (not self.encoder.isWall(init_pacman, False))
         assert (len(init_ghosts) == len(dir_ghosts))
         assert (not self.encoder.isWall(next_pos_pacman, False))
@@ -356,9 +371,9 @@ class Shield:
             return (max(probs))
 
         if res_prob < 0:
-            print("RESULT: init_pacman[0], init_pacman[1], dir_pacman, init_ghosts[0][0], init_ghosts[0][1], "
-                  "dir_ghosts[0], prob", init_pacman[0], init_pacman[1], next_dir_pacman, init_ghosts[0][0],
-                init_ghosts[0][1], dir_ghosts[0], res_prob)
+            logger.error("RESULT: init_pacman[0], init_pacman[1], dir_pacman, init_ghosts[0][0], init_ghosts[0][1], "
+                         "dir_ghosts[0], prob %s %s %s %s %s %s %s", init_pacman[0], init_pacman[1], next_dir_pacman,
+                         init_ghosts[0][0], init_ghosts[0][1], dir_ghosts[0], res_prob)
 
         assert (res_prob >= 0)
         return res_prob
@@ -28,6 +28,11 @@ STEPS_IN_ENCODING = True
 
 USE_CORRIDOR_ENCODING = True
 
+# The analysis of a wall grid only depends on the walls, so it is shared by
+# the encoders of a layout (by the walls of the grid)
+BOARD_ANALYSIS = ['crossings', 'hcorr', 'vcorr', 'deadend', 'corners', 'connected_corrs', 'connecting_corridors_via_pos']
+BOARD_ANALYSIS_CACHE = {}
+
 class StormEncoder:
 
     def __init__(self, state, symX, symY, distCrossings):
@@ -42,26 +47,39 @@ class StormEncoder:
         self.ghosts = state.getGhostPositions()  # self.computePathCounter()
         self.packages = state.getPackages()
 
-        # find all relevamt things for the fork lifter (avatar) (Grid includes packages)
+        # find all relevamt things for the fork lifter (avatar) and the fork trucks
+        # (adversary), for whom the packages are walls as well
         self.walls = state.getWalls(False)
-        self.crossings, self.hcorr, self.vcorr, self.deadend = self.mapBoard(False)
-        self.corners = self.mapCorners(False)
-        self.hcorr = self.splitHorizontal(self.hcorr, self.crossings)
-        self.vcorr = self.splitVertical(self.vcorr, self.crossings)
-        self.connected_corrs = self.computeConnectingCorridors(False)
+        self.analyzeBoard(False)
         self.relevant_crossings = self.getRelevantCrossings(False)
 
         self.walls_ghosts = state.getWalls(True)
-        self.crossings_ghosts, self.hcorr_ghosts, self.vcorr_ghosts, self.deadend_ghosts = self.mapBoard(True)
-        self.corners_ghosts = self.mapCorners(True)
-        self.hcorr_ghosts = self.splitHorizontal(self.hcorr_ghosts, self.crossings_ghosts)
-        self.vcorr_ghosts = self.splitVertical(self.vcorr_ghosts, self.crossings_ghosts)
-        self.connected_corrs_ghosts = self.computeConnectingCorridors(True)
+        self.analyzeBoard(True)
         self.relevant_crossings_ghosts = self.getRelevantCrossings(True)
 
         self.exit = (state.getExit()[0][0], self.h - state.getExit()[0][1] - 1)
         self.corssings_closest_exit = self.computeCrossingsClosestToExit(self.exit, self.crossings_ghosts)
 
+    def analyzeBoard(self, adversary):
+        """
+        Sets the crossings, corridors, dead ends, corners and connected corridors
+        of the walls of the avatar or the adversary (attributes ending with
+        _ghosts).  A grid with the same walls is only analyzed once.
+        """
+        suffix = '_ghosts' if adversary else ''
+        key = tuple(tuple(column) for column in self.getWalls(adversary).data)
+        if key not in BOARD_ANALYSIS_CACHE:
+            crossings, hcorr, vcorr, deadend = self.mapBoard(adversary)
+            setattr(self, 'crossings' + suffix, crossings)
+            setattr(self, 'deadend' + suffix, deadend)
+            setattr(self, 'corners' + suffix, self.mapCorners(adversary))
+            setattr(self, 'hcorr' + suffix, self.splitHorizontal(hcorr, crossings))
+            setattr(self, 'vcorr' + suffix, self.splitVertical(vcorr, crossings))
+            setattr(self, 'connected_corrs' + suffix, self.computeConnectingCorridors(adversary))
+            BOARD_ANALYSIS_CACHE[key] = [getattr(self, name + suffix) for name in BOARD_ANALYSIS]
+        for name, value in zip(BOARD_ANALYSIS, BOARD_ANALYSIS_CACHE[key]):
+            setattr(self, name + suffix, value)
+
     def computeCrossingsClosestToExit(self, exit, crossings):
 
         if self.distCrossings == 0:
@@ -327,60 +345,33 @@ class StormEncoder:
         return [crossings, hcorr, vcorr, deadend]
 
     def splitHorizontal(self, hcorr, crossings):
-        intersected = True
-        while intersected:
-            intersected = False
-            for crs in crossings:
-                tmph = []
-                for ch in hcorr:
-                    if ch[0][1] == crs[1] and not intersected:  # is on x axis, go and split
-                        if self.intersects(ch, crs):  # check if this corr intersects
-                            intersected = True
-                            leftPoint = tuple(numpy.subtract(crs, (1, 0)))
-                            rightPoint = tuple(numpy.add(crs, (1, 0)))
-
-                            if leftPoint >= ch[0]:
-                                c1 = (ch[0], leftPoint)
-                                tmph.append(c1)
-
-                            if rightPoint <= ch[1]:
-                                c2 = (rightPoint, ch[1])
-                                tmph.append(c2)
-
-                        else:
-                            tmph.append(ch)
-                    else:  # just leave this corridor
-                        tmph.append(ch)
-                hcorr = tmph.copy()
-        return hcorr
+        return self.splitCorridors(hcorr, crossings, 0)
 
     def splitVertical(self, vcorr, crossings):
-        intersected = True
-        while intersected:
-            intersected = False
-            # get all corridors on y axis of crossing
-            for crs in crossings:
-                tmpv = []
-                for cv in vcorr:
-                    if cv[0][0] == crs[0] and not intersected:
-                        if self.intersects(cv, crs):
-                            intersected = True
-                            upperPoint = tuple(numpy.subtract(crs, (0, 1)))
-                            lowerPoint = tuple(numpy.add(crs, (0, 1)))
-
-                            if upperPoint >= cv[0]:
-                                c1 = (cv[0], upperPoint)
-                                tmpv.append(c1)
-
-                            if lowerPoint <= cv[1]:
-                                c2 = (lowerPoint, cv[1])
-                                tmpv.append(c2)
-                        else:
-                            tmpv.append(cv)
-                    else:  # just leave this corridor
-                        tmpv.append(cv)
-                vcorr = tmpv.copy()
-        return vcorr
+        return self.splitCorridors(vcorr, crossings, 1)
+
+    def splitCorridors(self, corridors, crossings, axis):
+        """
+        Splits the corridors along axis (0 horizontal, 1 vertical) at the
+        crossings on them, which are left out.  A corridor is replaced by its
+        pieces in the order of the axis.
+        """
+        step = (1, 0) if axis == 0 else (0, 1)
+        crossingsOnLine = {}
+        for crs in sorted(crossings, key=lambda crs: crs[axis]):
+            crossingsOnLine.setdefault(crs[1 - axis], []).append(crs)
+
+        pieces = []
+        for start, end in corridors:
+            for crs in crossingsOnLine.get(start[1 - axis], []):
+                if self.intersects((start, end), crs):
+                    before = tuple(numpy.subtract(crs, step))
+                    if before >= start:
+                        pieces.append((start, before))
+                    start = tuple(numpy.add(crs, step))
+            if start <= end:
+                pieces.append((start, end))
+        return pieces
 
     #TODO: Remove me?
     def encodePositioningTerm(self, pos):
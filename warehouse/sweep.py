@@ -0,0 +1,243 @@
+# sweep.py
+#----------
+# The shielded warehouse code is build on the PAC-MAN environment
+# from UC Berkeley.
+#
+# ---------
+# Licensing Information from UC Berkeley:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+"""
+Runs warehouse.py for every configuration of a grid of parameters in a pool
+of processes and writes the score of every game to one csv file.
+
+The layouts (with the paths of the fork trucks) and the shield files are
+loaded once, before the pool is forked, so the runs share them.
+"""
+
+import contextlib
+import csv
+import itertools
+import os
+import sys
+import time
+
+import shield
+import warehouse
+from warehouse import default
+
+COLUMNS = ['layout', 'lookAhead', 'distCrossings', 'shield', 'epsilon', 'alpha', 'seed',
+           'game', 'phase', 'score', 'win', 'seconds']
+
+# Options of warehouse.py that the sweep sets for every run, and options
+# that would fork processes inside the workers of the pool
+SWEPT_OPTIONS = ['-l', '--layout', '--lookAhead', '-b', '--distCrossings', '-o', '--open', '--seed']
+FORKING_OPTIONS = ['--parallelEval', '--actors']
+
+_sweep = {}
+
+
+def parseValues(str, type=str):
+    """
+    Parses a comma separated list of values.  Integer ranges can be given as
+    first-last, e.g. "11-20" or "0,2,4-6".
+    """
+    values = []
+    for value in str.split(','):
+        value = value.strip()
+        if type == int and '-' in value[1:]:
+            first, last = value[1:].split('-', 1)
+            values.extend(range(int(value[0] + first), int(last) + 1))
+        else:
+            values.append(type(value))
+    return values
+
+
+def getOption(arg):
+    """
+    Returns the name of the option in arg and its value if it is attached
+    (--name=value or -nvalue), otherwise None.
+    """
+    if arg.startswith('--'):
+        name, equals, value = arg.partition('=')
+        return name, value if equals else None
+    if arg.startswith('-') and len(arg) > 2:
+        return arg[:2], arg[2:]
+    return arg, None
+
+
+def isOption(name, options):
+    "Returns whether name is one of the options or an abbreviation of a long one."
+    return any(name == option or (option.startswith('--') and len(name) > 2 and option.startswith(name))
+               for option in options)
+
+
+def splitAgentArgs(argv):
+    """
+    Takes the agent args (-a) out of the options of warehouse.py, so they can
+    be merged with those of the sweep.  Returns the remaining options and the
+    agent args.
+    """
+    options, agentArgs = [], []
+    args = iter(argv)
+    for arg in args:
+        name, value = getOption(arg)
+        if isOption(name, ['-a', '--agentArgs']):
+            agentArgs.append(value if value is not None else next(args, ''))
+        else:
+            options.append(arg)
+    return options, agentArgs
+
+
+def getArgv(configuration):
+    """
+    Returns the command line of warehouse.py that plays a configuration.
+    """
+    layoutName, lookAhead, distCrossings, shieldFile, epsilon, alpha, seed = configuration
+    argv = list(_sweep['argv']) + ['-q', '-l', layoutName, '--lookAhead', str(lookAhead),
+                                   '-b', str(distCrossings), '--seed', str(seed)]
+    if shieldFile:
+        argv += ['-o', shieldFile]
+    agentArgs = [arg for arg in [_sweep['agentArgs'], epsilon and 'epsilon=' + epsilon, alpha and 'alpha=' + alpha] if arg]
+    if agentArgs:
+        argv += ['-a', ','.join(agentArgs)]
+    return argv
+
+
+def runConfiguration(configuration):
+    """
+    Plays all games of a configuration in a worker process and returns a
+    row for every game.
+    """
+    layoutName, lookAhead, distCrossings, shieldFile, epsilon, alpha, seed = configuration
+    start = time.time()
+    results = []
+    with open(os.devnull, 'w') as output, contextlib.redirect_stdout(output):
+        args = warehouse.readCommand(getArgv(configuration), _sweep['layouts'])
+        warehouse.runGames(results=results, writeOutputs=False, **args)
+    seconds = time.time() - start
+    numTraining = args.get('numTraining', 0) + args.get('numGhostTraining', 0)
+    return [[layoutName, lookAhead, distCrossings, shieldFile, epsilon, alpha, seed,
+             i, ['exploitation', 'training'][i < numTraining], score, int(win), '%.1f' % seconds]
+            for i, (score, win) in enumerate(results)]
+
+
+def runSweep(configurations, argv, agentArgs, processes, fileName):
+    """
+    Plays the configurations in a pool of processes and writes the rows of
+    their games to fileName as soon as a configuration is finished.
+    """
+    import multiprocessing
+    _sweep['argv'] = argv
+    _sweep['agentArgs'] = agentArgs
+    _sweep['layouts'] = {}
+    # Load what the runs share before forking, checking the command line
+    # of every layout on the way
+    for layoutName in sorted(set(configuration[0] for configuration in configurations)):
+        first = [configuration for configuration in configurations if configuration[0] == layoutName][0]
+        with open(os.devnull, 'w') as output, contextlib.redirect_stdout(output):
+            warehouse.readCommand(getArgv(first), _sweep['layouts'])
+    for shieldFile in set(configuration[3] for configuration in configurations):
+        if shieldFile:
+            shield.loadShieldFile(shieldFile)
+
+    pool = multiprocessing.get_context('fork').Pool(processes)
+    try:
+        with open(fileName, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for done, rows in enumerate(pool.imap_unordered(runConfiguration, configurations)):
+                writer.writerows(rows)
+                f.flush()
+                print('%d/%d configurations done' % (done + 1, len(configurations)))
+    finally:
+        pool.terminate()
+        _sweep.clear()
+
+
+def readCommand(argv):
+    """
+    Processes the command used to run a sweep from the command line.
+    """
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python sweep.py <options> -- <warehouse.py options>
+    EXAMPLES:   (1) python sweep.py --lookAhead 11-20 -a extractor=SimpleExtractor -- -p ApproximateQAgent
+                    -g ForkTruckPath --localizedShield 1 -x 0 -y 300 -n 320
+                    - the look ahead study of warehouse.sh
+                (2) python sweep.py -b 2 --open shields/warehouse_2_crossings.dump --seeds 1-5 --epsilon 0.05,0.1
+                    -a extractor=SimpleExtractor -- -p ApproximateQAgent -g ForkTruckPath -x 100 -y 5 -n 200
+                    - five seeds for every exploration rate with a precomputed shield
+
+    The options of the sweep are comma separated lists, every combination of
+    them is played.  The options after -- are passed to every run of
+    warehouse.py.  Their agent args (-a) are merged with those of the sweep;
+    the options the sweep sets (-l, --lookAhead, -b, -o and --seed) cannot be
+    given there.  Every run plays in a process of its own, so --parallelEval
+    and --actors cannot be used.
+    """
+    parser = OptionParser(usageStr)
+
+    parser.add_option('-l', '--layouts', dest='layouts', help=default('the LAYOUT_FILES to play on'),
+                      metavar='LAYOUT_FILES', default='warehouse.lay')
+    parser.add_option('--lookAhead', dest='lookAhead', help=default('the look ahead values of the localized shield'),
+                      default='0')
+    parser.add_option('-b', '--distCrossings', dest='distCrossings',
+                      help=default('the distances to the exit, in which crossings will be shielded'), default='0')
+    parser.add_option('--open', dest='open', help=default('the OPEN_FILES from which to load the shield ("" computes it)'),
+                      metavar='OPEN_FILES', default='')
+    parser.add_option('--epsilon', dest='epsilon', help=default('the exploration rates ("" keeps the default of the agent)'),
+                      default='')
+    parser.add_option('--alpha', dest='alpha', help=default('the learning rates ("" keeps the default of the agent)'),
+                      default='')
+    parser.add_option('--seeds', dest='seeds', help=default('the master seeds of the runs'), default='0')
+    parser.add_option('-a', '--agentArgs', dest='agentArgs', help='Comma separated values sent to the agent of every run',
+                      default='')
+    parser.add_option('--processes', dest='processes', type='int', help=default('Number of runs played at the same time'),
+                      default=os.cpu_count())
+    parser.add_option('--output', dest='output', help=default('the csv FILE to which the games are written'),
+                      metavar='FILE', default='outputs/sweep.csv')
+
+    options, runArgv = parser.parse_args(argv)
+    runArgv, runAgentArgs = splitAgentArgs(runArgv)
+    for arg in runArgv:
+        name, value = getOption(arg)
+        if isOption(name, FORKING_OPTIONS):
+            raise Exception('The runs of a sweep cannot fork processes of their own: ' + arg)
+        if isOption(name, SWEPT_OPTIONS):
+            raise Exception('The option ' + arg + ' is set by the sweep, use the option of the sweep instead')
+
+    configurations = list(itertools.product(parseValues(options.layouts), parseValues(options.lookAhead, int),
+                                            parseValues(options.distCrossings, int), parseValues(options.open),
+                                            parseValues(options.epsilon), parseValues(options.alpha),
+                                            parseValues(options.seeds, int)))
+    args = dict()
+    args['configurations'] = configurations
+    args['argv'] = runArgv
+    args['agentArgs'] = ','.join(arg for arg in runAgentArgs + [options.agentArgs] if arg)
+    args['processes'] = max(1, min(options.processes, len(configurations)))
+    args['fileName'] = options.output
+    return args
+
+
+if __name__ == '__main__':
+    """
+    The main function called when sweep.py is run
+    from the command line:
+
+    > python sweep.py
+
+    See the usage string for more details.
+
+    > python sweep.py --help
+    """
+    args = readCommand(sys.argv[1:])
+    runSweep(**args)
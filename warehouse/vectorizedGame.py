@@ -0,0 +1,313 @@
+# vectorizedGame.py
+# -----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+vectorizedGame.py runs many warehouse games on the same layout in lockstep.
+
+The whole batch is kept in NumPy arrays (positions, directions, loading
+state and packages) and the rules of warehouse.py (PacmanRules and
+GhostRules) are applied to all games at once.  This is meant for
+collecting fork truck statistics and for evaluating policies over
+thousands of short rollouts without building a GameState per move.
+
+Actions are stored as indices into ACTIONS.
+
+  >>> lay = layout.getLayout('warehouse')
+  >>> lay.getPaths()
+  >>> games = VectorizedGame(lay, 1000, [VectorizedForkTruckPath(i + 1, lay.paths) for i in range(lay.getNumGhosts())])
+  >>> scores, wins = games.runEpisodes()
+"""
+
+import numpy as np
+
+from adversaryAgents import ForkTruckPath
+from game import Directions
+from warehouse import COLLISION_TOLERANCE, TIME_PENALTY
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST, Directions.STOP]
+NORTH, SOUTH, EAST, WEST, STOP = range(5)
+REVERSE = np.array([SOUTH, NORTH, WEST, EAST, STOP])
+VECTORS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)])
+
+
+class VectorizedGame:
+    """
+    A batch of numGames warehouse games played on one layout.
+
+    ghostPolicies holds one policy per fork truck (see VectorizedRandomGhost,
+    VectorizedDirectionalGhost and VectorizedForkTruckPath), a single policy
+    is used for every fork truck.
+    """
+
+    def __init__(self, layout, numGames, ghostPolicies, numGhosts=None, seed=None, maxMoves=None):
+        self.layout = layout
+        self.numGames = numGames
+        self.maxMoves = maxMoves
+        self.random = np.random.default_rng(seed)
+
+        if numGhosts is None:
+            numGhosts = layout.getNumGhosts()
+        agentPositions = [pos for isPacman, pos in layout.agentPositions if isPacman]
+        agentPositions += [pos for isPacman, pos in layout.agentPositions if not isPacman][:numGhosts]
+        self.numGhosts = len(agentPositions) - 1
+        if not isinstance(ghostPolicies, (list, tuple)):
+            ghostPolicies = [ghostPolicies]
+        if len(ghostPolicies) == 1:
+            ghostPolicies = list(ghostPolicies) * self.numGhosts
+        self.ghostPolicies = ghostPolicies
+
+        self.walls = np.array(layout.walls.data, dtype=bool)
+        self.wallsGhost = np.array(layout.wallsGhost.data, dtype=bool)
+        self.exit = np.zeros_like(self.walls)
+        for x, y in layout.exitPos:
+            self.exit[x, y] = True
+        self.initialPackages = np.array(layout.packages.data, dtype=bool)
+        self.startPositions = np.array(agentPositions, dtype=int)
+        self.reset()
+
+    def reset(self):
+        """
+        Puts every game of the batch back into the start configuration.
+        """
+        K, A = self.numGames, self.numGhosts + 1
+        self.positions = np.tile(self.startPositions[None, :, :], (K, 1, 1))
+        self.directions = np.full((K, A), STOP, dtype=int)
+        self.loaded = np.zeros(K, dtype=bool)
+        self.packages = np.tile(self.initialPackages[None, :, :], (K, 1, 1))
+        self.numPackages = self.packages.reshape(K, -1).sum(axis=1)
+        self.scores = np.zeros(K, dtype=int)
+        self.wins = np.zeros(K, dtype=bool)
+        self.loses = np.zeros(K, dtype=bool)
+        self.moves = np.zeros(K, dtype=int)
+        self.lastActions = np.full((K, A), STOP, dtype=int)
+        for policy in self.ghostPolicies:
+            if hasattr(policy, 'reset'):
+                policy.reset(self)
+
+    def isDone(self):
+        done = self.wins | self.loses
+        if self.maxMoves is not None:
+            done = done | (self.moves >= self.maxMoves)
+        return done
+
+    def getLegalActions(self, agentIndex):
+        """
+        Returns a (numGames, 5) boolean mask of the legal actions of an agent,
+        following PacmanRules.getLegalActions and GhostRules.getLegalActions.
+        """
+        pos = self.positions[:, agentIndex]
+        direction = self.directions[:, agentIndex]
+        # Same bounds as Actions.getPossibleActions, which lets -1 wrap around
+        width, height = self.walls.shape
+        x = pos[:, 0, None] + VECTORS[None, :, 0]
+        y = pos[:, 1, None] + VECTORS[None, :, 1]
+        inside = (x < width) & (y < height)
+        x, y = x % width, y % height
+        if agentIndex == 0:
+            # A loaded pacman can not pass other packages, the display turns
+            # every loaded package into a wall of the layout (see NullGraphics)
+            games = np.arange(len(pos))[:, None]
+            loadedPackages = self.initialPackages[x, y] & ~self.packages[games, x, y]
+            walls = np.where(self.loaded[:, None], self.wallsGhost[x, y], self.walls[x, y] | loadedPackages)
+            legal = inside & ~walls
+        else:
+            legal = inside & ~self.wallsGhost[x, y]
+            legal[:, STOP] = False
+            reverse = np.zeros_like(legal)
+            reverse[np.arange(len(pos)), REVERSE[direction]] = True
+            dropReverse = reverse & legal & (legal.sum(axis=1) > 1)[:, None]
+            legal &= ~dropReverse
+        return legal
+
+    def chooseActions(self, distributions):
+        """
+        Samples one action per game from a (numGames, 5) array of weights.
+        """
+        total = distributions.sum(axis=1, keepdims=True)
+        total[total == 0] = 1
+        cumulative = np.cumsum(distributions / total, axis=1)
+        r = self.random.random((len(distributions), 1))
+        actions = (cumulative < r).sum(axis=1)
+        actions[distributions.sum(axis=1) == 0] = STOP
+        return np.minimum(actions, STOP)
+
+    def step(self, pacmanActions):
+        """
+        Plays one round (pacman followed by every fork truck) in all running
+        games.  Returns the score change of the round for every game.
+        """
+        active = ~self.isDone()
+        scoresBefore = self.scores.copy()
+        self.lastActions[active] = STOP
+        self.moves[active] += 1
+
+        self.applyPacmanAction(np.asarray(pacmanActions), active.copy())
+        for index in range(1, self.numGhosts + 1):
+            active &= ~(self.wins | self.loses)
+            if not active.any():
+                break
+            distributions = self.ghostPolicies[index - 1].getDistribution(self, index)
+            actions = self.chooseActions(distributions)
+            self.applyGhostAction(actions, index, active)
+        return self.scores - scoresBefore
+
+    def applyPacmanAction(self, actions, active):
+        games = np.nonzero(active)[0]
+        if len(games) == 0:
+            return
+        actions = actions[games]
+        self.lastActions[games, 0] = actions
+        self.positions[games, 0] += VECTORS[actions]
+        moving = actions != STOP
+        self.directions[games[moving], 0] = actions[moving]
+        self.scores[games] -= TIME_PENALTY
+
+        # Load a package
+        x, y = self.positions[games, 0].T
+        load = self.packages[games, x, y] & ~self.loaded[games]
+        self.packages[games[load], x[load], y[load]] = False
+        self.numPackages[games[load]] -= 1
+        self.loaded[games[load]] = True
+        self.scores[games[load]] += 25
+
+        # Unload it at the exit
+        atExit = self.exit[x, y]
+        unload = atExit & self.loaded[games]
+        self.loaded[games[unload]] = False
+        self.scores[games[unload]] += 25
+
+        done = atExit & (self.numPackages[games] == 0) & ~self.loses[games]
+        self.scores[games[done]] += 500
+        self.wins[games[done]] = True
+
+        for index in range(1, self.numGhosts + 1):
+            self.checkDeath(games, index)
+
+    def applyGhostAction(self, actions, index, active):
+        games = np.nonzero(active)[0]
+        actions = actions[games]
+        self.lastActions[games, index] = actions
+        self.positions[games, index] += VECTORS[actions]
+        moving = actions != STOP
+        self.directions[games[moving], index] = actions[moving]
+        self.checkDeath(games, index)
+
+    def checkDeath(self, games, index):
+        distance = np.abs(self.positions[games, index] - self.positions[games, 0]).sum(axis=1)
+        killed = games[distance <= COLLISION_TOLERANCE]
+        killed = killed[~self.wins[killed]]
+        self.scores[killed] -= 500
+        self.loses[killed] = True
+
+    def runEpisodes(self, pacmanPolicy=None):
+        """
+        Plays all games of the batch until they are over and returns the
+        final scores and the wins.  pacmanPolicy maps the batch to one action
+        index per game; by default pacman moves uniformly at random.
+        """
+        if pacmanPolicy is None:
+            pacmanPolicy = VectorizedRandomPacman()
+        self.reset()
+        while not self.isDone().all():
+            self.step(pacmanPolicy.getActions(self))
+        return self.scores.copy(), self.wins.copy()
+
+
+class VectorizedRandomPacman:
+    "A pacman that chooses a legal action uniformly at random."
+
+    def getActions(self, games):
+        return games.chooseActions(games.getLegalActions(0).astype(float))
+
+
+class VectorizedRandomGhost:
+    "A fork truck that chooses a legal action uniformly at random."
+
+    def getDistribution(self, games, index):
+        return games.getLegalActions(index).astype(float)
+
+
+class VectorizedDirectionalGhost:
+    "A fork truck that prefers to rush Pacman."
+
+    def __init__(self, prob_attack=0.5):
+        self.prob_attack = prob_attack
+
+    def getDistribution(self, games, index):
+        legal = games.getLegalActions(index)
+        newPositions = games.positions[:, index, None, :] + VECTORS[None, :, :]
+        distances = np.abs(newPositions - games.positions[:, 0, None, :]).sum(axis=2)
+        # Illegal actions never count as best action
+        bestScore = np.where(legal, distances, np.iinfo(int).max).min(axis=1)
+        best = legal & (distances == bestScore[:, None])
+
+        numLegal = np.maximum(legal.sum(axis=1, keepdims=True), 1)
+        numBest = np.maximum(best.sum(axis=1, keepdims=True), 1)
+        return best * (self.prob_attack / numBest) + legal * ((1 - self.prob_attack) / numLegal)
+
+
+class VectorizedForkTruckPath:
+    """
+    The batched version of ForkTruckPath: the fork truck drives along one of
+    its five shortest paths and picks a new one at either end.
+    """
+
+    def __init__(self, index, allPaths):
+        self.index = index
+        self.paths = sorted(allPaths[index - 1], key=len)[:5]
+        self.start = self.paths[0][0]
+        self.end = self.paths[0][-1]
+        probability = ForkTruckPath.probability[len(self.paths)]
+        self.probability = np.array([probability[i] for i in range(len(self.paths))])
+
+        # nextAction[path, goToEnd, x, y] is the action leading to the next cell of a path
+        width = max(x for path in self.paths for x, y in path) + 1
+        height = max(y for path in self.paths for x, y in path) + 1
+        self.nextAction = np.full((len(self.paths), 2, width + 1, height + 1), STOP, dtype=int)
+        for p, path in enumerate(self.paths):
+            for i, (x, y) in enumerate(path):
+                if i + 1 < len(path):
+                    self.nextAction[p, 1, x, y] = self.getAction((x, y), path[i + 1])
+                if i > 0:
+                    self.nextAction[p, 0, x, y] = self.getAction((x, y), path[i - 1])
+        self.currentPathIndex = None
+        self.goToEnd = None
+
+    def getAction(self, position, nextPosition):
+        dx, dy = nextPosition[0] - position[0], nextPosition[1] - position[1]
+        return int(np.nonzero((VECTORS[:, 0] == dx) & (VECTORS[:, 1] == dy))[0][0])
+
+    def reset(self, games):
+        self.currentPathIndex = np.zeros(games.numGames, dtype=int)
+        self.goToEnd = np.zeros(games.numGames, dtype=bool)
+
+    def choosePaths(self, games, count):
+        r = games.random.random((count, 1))
+        return np.minimum((np.cumsum(self.probability)[None, :] < r).sum(axis=1), len(self.paths) - 1)
+
+    def getDistribution(self, games, index):
+        x, y = games.positions[:, index].T
+        atStart = (x == self.start[0]) & (y == self.start[1])
+        atEnd = (x == self.end[0]) & (y == self.end[1])
+        self.currentPathIndex[atStart] = self.choosePaths(games, atStart.sum())
+        self.goToEnd[atStart] = True
+        self.currentPathIndex[atEnd] = self.choosePaths(games, atEnd.sum())
+        self.goToEnd[atEnd] = False
+
+        x = np.minimum(x, self.nextAction.shape[2] - 1)
+        y = np.minimum(y, self.nextAction.shape[3] - 1)
+        actions = self.nextAction[self.currentPathIndex, self.goToEnd.astype(int), x, y]
+        distributions = np.zeros((games.numGames, len(ACTIONS)))
+        distributions[np.arange(games.numGames), actions] = 1.0
+        return distributions
@@ -21,6 +21,7 @@ import random
 import sys
 
 import layout
+import util
 from game import Actions
 from game import Directions
 from game import Game
@@ -75,6 +76,7 @@ class GameState:
         else:
             return GhostRules.getLegalActions(self, agentIndex)
 
+    @util.timed('generateSuccessor')
     def generateSuccessor(self, agentIndex, action):
         """
         Returns the successor state after the specified agent takes the action.
@@ -512,9 +514,12 @@ def parseAgentArgs(str):
     return opts
 
 
-def readCommand(argv):
+def readCommand(argv, layouts=None):
     """
     Processes the command used to run pacman from the command line.
+
+    layouts is an optional dict of layouts (and their fork truck paths)
+    that were already loaded, by name.  Layouts loaded here are added to it.
     """
     from optparse import OptionParser
     usageStr = """
@@ -578,20 +583,44 @@ def readCommand(argv):
                       help=default('Learning with a localized shield to get safe actions'), default=0)
     parser.add_option('--lookAhead', dest='lookAhead', type='int',
                       help=default('Number of steps looked ahead, based on which safe actions are computed'), default=0)
+    parser.add_option('--parallelEval', dest='parallelEval', type='int',
+                      help=default('Number of processes playing the exploitation games (without graphics)'), default=0)
+    parser.add_option('--seed', dest='seed', type='int',
+                      help=default('Master seed from which the random seed of every game is derived'), default=None)
+    parser.add_option('--logLevel', dest='logLevel', type='choice', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                      help=default('Level of the agent and shield log output (DEBUG prints every move)'), default='WARNING')
+    parser.add_option('--timing', action='store_true', dest='timing',
+                      help='Measure the time per phase of a step and write it to outputs/timings_*', default=False)
+    parser.add_option('--profile', action='store_true', dest='profile',
+                      help='Run the games under cProfile and write the stats to outputs/profile_*', default=False)
+    parser.add_option('--actors', dest='actors', type='int',
+                      help=default('Number of actor processes playing the training games for one learner'), default=0)
+    parser.add_option('--checkpoint', dest='checkpoint', help=default('the CHECKPOINT_FILE to which the learning state is saved'),
+                      metavar='CHECKPOINT_FILE', default='')
+    parser.add_option('--checkpointEvery', dest='checkpointEvery', type='int',
+                      help=default('Number of games between two checkpoints (0 = only after the last game)'), default=0)
+    parser.add_option('--resume', dest='resume', help=default('the CHECKPOINT_FILE from which to continue a run'),
+                      metavar='CHECKPOINT_FILE', default='')
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
         raise Exception('Command line input not understood: ' + str(otherjunk))
     args = dict()
+    util.configureLogging(options.logLevel)
 
     # Fix the random seed
     if options.fixRandomSeed:
         random.seed('cs188')
 
     # Choose a layout
-    args['layout'] = layout.getLayout(options.layout)
+    if layouts is not None and options.layout in layouts:
+        args['layout'] = layouts[options.layout]
+    else:
+        args['layout'] = layout.getLayout(options.layout)
     if args['layout'] == None:
         raise Exception("The layout " + options.layout + " cannot be found")
+    if layouts is not None:
+        layouts[options.layout] = args['layout']
 
     # Choose a Pacman agent
     noKeyboard = options.gameToReplay == None and (options.textGraphics or options.quietGraphics)
@@ -634,6 +663,11 @@ def readCommand(argv):
         pacman.setSymmetryParameters(options.symX, options.symY)
         pacman.setDistanceParameter(options.distCrossings)
 
+    if (options.checkpoint or options.resume) and not hasattr(pacman, 'getCheckpoint'):
+        raise Exception("The agent " + options.pacman + " does not support checkpoints")
+    if options.actors > 1 and not hasattr(pacman, 'learnFromActor'):
+        raise Exception("The agent " + options.pacman + " cannot be trained by actors")
+
     # Don't display training games
     if 'numTrain' in agentOpts:
         options.numQuiet = int(agentOpts['numTrain'])
@@ -642,7 +676,8 @@ def readCommand(argv):
     # Choose a ghost agent
     ghostType = loadAgent(options.ghost, noKeyboard)
     if options.ghost == "ForkTruckPath":
-        args['layout'].getPaths()
+        if len(args['layout'].paths) == 0:
+            args['layout'].getPaths()
         args['ghosts'] = [ghostType(i + 1, args['layout'].paths) for i in range(args['layout'].numGhosts)]
     else:
         args['ghosts'] = [ghostType(i + 1) for i in range(options.numGhosts)]
@@ -664,6 +699,14 @@ def readCommand(argv):
     args['timeout'] = options.timeout
     args['symX'] = options.symX
     args['symY'] = options.symY
+    args['parallelEval'] = options.parallelEval
+    args['seed'] = options.seed
+    args['timing'] = options.timing
+    args['profile'] = options.profile
+    args['actors'] = options.actors
+    args['checkpoint'] = options.checkpoint
+    args['checkpointEvery'] = options.checkpointEvery
+    args['resume'] = options.resume
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
@@ -733,8 +776,203 @@ def replayGame(layout, actions, display):
     display.finish()
 
 
+class RecordedGame:
+    """
+    The score and outcome of a game played before the checkpoint a run was
+    resumed from.  It stands in for the game (and its state) in the
+    statistics of runGames.
+    """
+
+    def __init__(self, score, win):
+        self.score = score
+        self.win = win
+        self.state = self
+
+    def getScore(self):
+        return self.score
+
+    def isWin(self):
+        return self.win
+
+
+def saveCheckpoint(fileName, pacman, record, averageScores, winRates):
+    """
+    Writes the learning state of the agent, the random state and the
+    results of the games played so far (record holds (score, win) per game)
+    to fileName.  The file is replaced at once, so an interrupted run keeps
+    its last complete checkpoint.
+    """
+    import pickle
+    checkpoint = {'games': len(record), 'record': record,
+                  'averageScores': averageScores, 'winRates': winRates,
+                  'random': random.getstate(),
+                  'agent': pacman.getCheckpoint(fileName + '.shield')}
+    with open(fileName + '.tmp', 'wb') as f:
+        pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(fileName + '.tmp', fileName)
+
+
+def loadCheckpoint(fileName, pacman):
+    "Restores the agent and the random state of a checkpoint and returns the checkpoint."
+    import pickle
+    with open(fileName, 'rb') as f:
+        checkpoint = pickle.load(f)
+    pacman.loadCheckpoint(checkpoint['agent'])
+    random.setstate(checkpoint['random'])
+    print('Resuming from %s after %d games' % (fileName, checkpoint['games']))
+    return checkpoint
+
+
+class EvaluatedGame:
+    """
+    The outcome of a game that runGames played in a worker process.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+
+_evaluation = {}
+
+
+def runEvaluationGame(i):
+    """
+    Plays exploitation game i in a worker process of runParallelGames and
+    returns its final state together with everything the game printed.
+    """
+    rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds = _evaluation['args']
+    import contextlib
+    import io
+    import textDisplay
+    if seeds is not None:
+        random.seed(seeds[i])
+    # Exploration still decays with the number of episodes played
+    if hasattr(pacman, 'episodesSoFar'):
+        pacman.episodesSoFar = _evaluation['episodesSoFar'] + i - _evaluation['first']
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        print("Game Nr %d" % (i))
+        game = rules.newGame(layout.deepCopy(), pacman, ghosts, textDisplay.NullGraphics(), False, catchExceptions, symX, symY, distCrossings)
+        game.run()
+        util.flushLogging()
+    return game.state, output.getvalue(), util.TIMER.endEpisode()
+
+
+def runParallelGames(indices, processes, rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds):
+    """
+    Plays the games with the given indices with a frozen copy of the agents
+    in a pool of processes and yields them in order.  The workers are forked,
+    so the pool sees the agents (weights and shield) as they are right now.
+    """
+    import multiprocessing
+    if seeds is None:
+        # Forked workers would otherwise all continue from the same random state
+        seeds = dict((i, random.randrange(2 ** 32)) for i in indices)
+    _evaluation['args'] = (rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds)
+    _evaluation['first'] = indices[0]
+    _evaluation['episodesSoFar'] = getattr(pacman, 'episodesSoFar', 0)
+    pool = multiprocessing.get_context('fork').Pool(processes)
+    try:
+        for state, output, timings in pool.imap(runEvaluationGame, indices):
+            sys.stdout.write(output)
+            util.TIMER.addEpisode(timings)
+            yield EvaluatedGame(state)
+    finally:
+        pool.terminate()
+        _evaluation.clear()
+
+
+def runActor(actor, tasks, results, weights, rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds):
+    """
+    Plays training games in an actor process of runActorGames.  The agent
+    only records its transitions, which are sent to the learner after every
+    game together with everything the game printed.  The learner answers
+    with its current weights, which are used for the next game.
+    """
+    import contextlib
+    import io
+    import textDisplay
+    import traceback
+    try:
+        for i in iter(tasks.get, None):
+            if seeds is not None:
+                random.seed(seeds[i])
+            pacman.episodesSoFar = i
+            pacman.actorTransitions = []
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                print("Game Nr %d" % (i))
+                game = rules.newGame(layout.deepCopy(), pacman, ghosts, textDisplay.NullGraphics(), True, catchExceptions, symX, symY, distCrossings)
+                game.run()
+                util.flushLogging()
+            results.put((actor, i, game.state, output.getvalue(), util.TIMER.endEpisode(),
+                         pacman.featureIndex.names, pacman.actorTransitions, pacman.episodeRewards))
+            pacman.setWeights(*weights.get())
+    except Exception:
+        # The learner waits for the result of this game, send it the error instead
+        results.put((actor, None, traceback.format_exc()))
+
+
+def runActorGames(indices, actors, rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds):
+    """
+    Plays the training games with the given indices in a number of forked
+    actor processes and learns from their transitions in this process (the
+    learner).  The actors share the shield of the learner read-only and get
+    its weights after every game.  The games are yielded in order.
+    """
+    import multiprocessing
+    context = multiprocessing.get_context('fork')
+    if seeds is None:
+        # Forked actors would otherwise all continue from the same random state
+        seeds = dict((i, random.randrange(2 ** 32)) for i in indices)
+    tasks, results = context.Queue(), context.Queue()
+    for i in indices:
+        tasks.put(i)
+    for actor in range(actors):
+        tasks.put(None)
+    weights = [context.Queue() for actor in range(actors)]
+    processes = [context.Process(target=runActor, args=(actor, tasks, results, weights[actor], rules, layout, pacman, ghosts,
+                                                        catchExceptions, symX, symY, distCrossings, seeds))
+                 for actor in range(actors)]
+    for process in processes:
+        process.start()
+    try:
+        finished = {}
+        for i in indices:
+            while i not in finished:
+                result = results.get()
+                if result[1] is None:
+                    raise Exception('Actor %d failed:\n%s' % (result[0], result[2]))
+                actor, j, state, output, timings, names, transitions, rewards = result
+                pacman.learnFromActor(names, transitions)
+                pacman.accumTrainRewards += rewards
+                weights[actor].put((list(pacman.featureIndex.names), pacman.weights))
+                util.TIMER.addEpisode(timings)
+                finished[j] = state, output
+            state, output = finished.pop(i)
+            sys.stdout.write(output)
+            pacman.episodesSoFar = i + 1
+            yield EvaluatedGame(state)
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    if not pacman.isInTraining():
+        # Take off the training wheels, like stopEpisode
+        pacman.epsilon = 0.0
+        pacman.alpha = 0.0
+
+
 def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, numGhostTraining=0, withoutShield=0, localizedShield=0, lookAhead=0, distCrossings=0,
-             catchExceptions=False, timeout=60, symX=False, symY=False):
+             catchExceptions=False, timeout=60, symX=False, symY=False, parallelEval=0, seed=None, timing=False, profile=False,
+             checkpoint='', checkpointEvery=0, resume='', actors=0, results=None, writeOutputs=True):
+    """
+    Plays the games and writes the statistics to outputs/.  If results is a
+    list, the (score, win) of every game is appended to it; writeOutputs=False
+    skips the scores_ and wins_ files (e.g. for runs of a sweep).
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
@@ -747,10 +985,58 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, n
     horizon = 2*lookAhead
     file_name_scores = "outputs/" + "scores_" + str(layout.name) + "_b" + str(distCrossings) + "_w" + str(withoutShield) + "_ls" + str(localizedShield) + "_la" + str(lookAhead) + "_n" + str(numGames) + "_x" + str(numTraining) + "_y" + str(numGhostTraining) + ".txt"
     file_name_wins = "outputs/" + "wins_" + str(layout.name) + "_b" + str(distCrossings) + "_w" + str(withoutShield) + "_ls" + str(localizedShield) + "_la" + str(lookAhead) + "_n" + str(numGames) + "_x" + str(numTraining) + "_y" + str(numGhostTraining) + ".txt"
+    file_name_suffix = str(layout.name) + "_b" + str(distCrossings) + "_w" + str(withoutShield) + "_ls" + str(localizedShield) + "_la" + str(lookAhead) + "_n" + str(numGames) + "_x" + str(numTraining) + "_y" + str(numGhostTraining)
+    file_name_timings = "outputs/" + "timings_" + file_name_suffix
+    file_name_profile = "outputs/" + "profile_" + file_name_suffix + ".prof"
+    if not writeOutputs:
+        file_name_scores = file_name_wins = os.devnull
     file_scores = open(file_name_scores, "w+")
     file_wins = open(file_name_wins, "w+")
+    gameRecord = []
+
+    # Continue after the games of the checkpoint, with their statistics
+    first = 0
+    if resume:
+        resumed = loadCheckpoint(resume, pacman)
+        first = resumed['games']
+        gameRecord = list(resumed['record'])
+        for i, (score, win) in enumerate(gameRecord):
+            game = RecordedGame(score, win)
+            if i >= numTraining + numGhostTraining:
+                games.append(game)
+            stat_games.append(game)
+            if i >= first - first % 10:
+                last_n_games.append(game)
+        average_scores = list(resumed['averageScores'])
+        win_rates = list(resumed['winRates'])
+        for averageScore, winRate in zip(average_scores, win_rates):
+            file_scores.write(str(averageScore) + "\n")
+            file_wins.write(str(winRate) + "\n")
 
-    for i in range(numGames):
+    util.TIMER.enabled = timing
+    if profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    seeds = None
+    if seed is not None:
+        masterSeed = random.Random(seed)
+        seeds = [masterSeed.randrange(2 ** 32) for i in range(numGames)]
+
+    # The agent is frozen once training is over, so the remaining games can
+    # be played in parallel (the first game may still load the shield)
+    numSequential = numGames
+    if parallelEval > 1:
+        numSequential = min(numGames, max(numTraining + numGhostTraining, first + 1))
+
+    # Training games after learning the ghost model (and after the first
+    # game, which may load the shield) can be played by actors
+    actorGames = range(0)
+    if actors > 1:
+        actorGames = range(max(numGhostTraining, first, 1), min(numTraining + numGhostTraining, numSequential))
+
+    def playGame(i):
         print("Game Nr %d" % (i))
         beQuiet = i < numTraining + numGhostTraining
         #beQuiet = False
@@ -764,11 +1050,45 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, n
 
             rules.quiet = False
 
+        if seeds is not None:
+            random.seed(seeds[i])
         layout_copy = layout.deepCopy()
         game = rules.newGame(layout_copy, pacman, ghosts, gameDisplay, beQuiet, catchExceptions, symX, symY, distCrossings)
 
         game.run()
-        if not beQuiet:
+        util.flushLogging()
+        util.TIMER.endEpisode()
+        return game
+
+    def playGames():
+        i = first
+        while i < numSequential:
+            if i in actorGames:
+                rules.quiet = True
+                indices = list(range(i, actorGames.stop))
+                sequentialGames = runActorGames(indices, actors, rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds)
+            else:
+                indices = [i]
+                sequentialGames = (playGame(i) for i in indices)
+            for i, game in zip(indices, sequentialGames):
+                yield i, game
+
+                if checkpoint and ((checkpointEvery > 0 and (i + 1) % checkpointEvery == 0) or i + 1 == numSequential):
+                    saveCheckpoint(checkpoint, pacman, gameRecord, average_scores, win_rates)
+            i += 1
+
+        if numSequential < numGames:
+            rules.quiet = False
+            indices = list(range(numSequential, numGames))
+            parallelGames = runParallelGames(indices, parallelEval, rules, layout, pacman, ghosts, catchExceptions, symX, symY, distCrossings, seeds)
+            for i, game in zip(indices, parallelGames):
+                yield i, game
+
+    for i, game in playGames():
+        gameRecord.append((game.state.getScore(), game.state.isWin()))
+        if results is not None:
+            results.append(gameRecord[-1])
+        if i >= numTraining + numGhostTraining:
             games.append(game)
         stat_games.append(game)
         last_n_games.append(game)
@@ -825,6 +1145,11 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, n
 
     file_scores.close()
     file_wins.close()
+    if profile:
+        profiler.disable()
+        profiler.dump_stats(file_name_profile)
+    if timing:
+        util.TIMER.write(file_name_timings)
     return games
 
 
@@ -842,6 +1167,4 @@ if __name__ == '__main__':
     args = readCommand(sys.argv[1:])  # Get game components based on input
     runGames(**args)
 
-    # import cProfile
-    # cProfile.run("runGames( **args )")
     pass